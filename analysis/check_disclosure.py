@@ -0,0 +1,176 @@
+"""Checks the released output tables for counts that should have been redacted.
+
+Every CSV matching RELEASED_PATTERNS is scanned against the rules that
+redact_small_numbers enforces:
+
+    small_count    a count between 1 and the threshold is shown
+    derived_value  a rate or proportion is shown where one of the counts it is
+                   derived from has been redacted, or a change in a rate is
+                   shown where the rate has been redacted
+
+The decile tables hold percentiles of the practices' counts under the
+numerator's name, so a small percentile is reported as a small count too.
+
+Violations are reported by file, line number and column, without the values
+themselves, so that the report can be released.  The script exits with a
+non-zero status if there are any, so that it can be used as a gate before
+outputs are released.
+"""
+import argparse
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from measure_manifest import get_measure_specs
+from profiling import stage, write_profile
+from utilities import add_jobs_argument, run_jobs
+
+BASE_DIR = Path(__file__).parents[1]
+OUTPUT_DIR = BASE_DIR / "output" / "joined"
+REPORT_PATH = BASE_DIR / "output" / "disclosure_check.csv"
+
+SMALL_NUMBER_THRESHOLD = 5
+
+RELEASED_PATTERNS = [
+    "measure_*.csv",
+    "rate_table_*.csv",
+    "decile_table*.csv",
+    "top_5_code_table*.csv",
+    "time_series_*.csv",
+    "baseline_comparison_*.csv",
+]
+
+# Columns derived from the counts in the same row
+DERIVED_COLUMNS = ["value", "Proportion of codes (%)"]
+
+# Columns of the time series tables derived from the rate in the same row.  The
+# rolling mean is left out, as it skips months whose rate is missing.
+RATE_DERIVED_COLUMNS = ["mom_change", "mom_percent_change", "yoy_change", "yoy_percent_change"]
+
+VIOLATION_COLUMNS = ["file", "line", "column", "rule"]
+
+# Number of violations printed by the command line script
+MAX_PRINTED = 20
+
+
+def get_count_columns():
+    """Gets the names of the count columns in the released tables: the
+    numerator and denominator of every measure, and the top 5 tables' Events."""
+    columns = ["Events"]
+    for spec in get_measure_specs():
+        for column in [spec.numerator, spec.denominator]:
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+
+def check_table(df, count_columns, n=SMALL_NUMBER_THRESHOLD):
+    """Finds the cells of a table that break the redaction rules.
+
+    Args:
+        df: the table, with each count column as floats (NaN where redacted)
+        count_columns: names of the count columns in df
+        n: threshold for low number suppression
+    Returns:
+        A table with the row position, column and rule of each violation.
+    """
+    violations = []
+
+    def add(mask, column, rule):
+        rows = np.flatnonzero(mask)
+        violations.append(pd.DataFrame({"row": rows, "column": column, "rule": rule}))
+
+    for column in count_columns:
+        values = df[column].to_numpy(dtype=float, na_value=np.nan)
+        add((values > 0) & (values <= n), column, "small_count")
+
+    if count_columns:
+        redacted = df[count_columns].isna().any(axis=1).to_numpy()
+        for column in DERIVED_COLUMNS:
+            if column in df.columns:
+                add(redacted & df[column].notna().to_numpy(), column, "derived_value")
+
+    if "value" in df.columns:
+        redacted_rate = df["value"].isna().to_numpy()
+        for column in RATE_DERIVED_COLUMNS:
+            if column in df.columns:
+                add(redacted_rate & df[column].notna().to_numpy(), column, "derived_value")
+
+    if not violations:
+        return pd.DataFrame({"row": [], "column": [], "rule": []})
+    return pd.concat(violations, ignore_index=True)
+
+
+def check_file(path, n=SMALL_NUMBER_THRESHOLD):
+    """Checks a released CSV file, reading only its count and derived columns.
+
+    Returns:
+        A table of violations, with VIOLATION_COLUMNS.  Line numbers count the
+        header as line 1.
+    """
+    path = Path(path)
+    header = pd.read_csv(path, nrows=0).columns
+    count_columns = [c for c in get_count_columns() if c in header]
+    usecols = count_columns + [c for c in DERIVED_COLUMNS + RATE_DERIVED_COLUMNS if c in header]
+    if not usecols:
+        return pd.DataFrame(columns=VIOLATION_COLUMNS)
+
+    with stage("check_file", measure=path.name) as record:
+        df = pd.read_csv(path, usecols=usecols, dtype={c: float for c in usecols})
+        record["rows"] = len(df)
+        violations = check_table(df, count_columns, n)
+        return pd.DataFrame(
+            {
+                "file": path.name,
+                "line": violations["row"].astype("int64") + 2,
+                "column": violations["column"],
+                "rule": violations["rule"],
+            },
+            columns=VIOLATION_COLUMNS,
+        )
+
+
+def get_released_files(directory=None):
+    """Gets the released CSV files in directory, sorted by name."""
+    directory = Path(directory) if directory is not None else OUTPUT_DIR
+    return sorted(
+        {path for pattern in RELEASED_PATTERNS for path in directory.glob(pattern)}
+    )
+
+
+def check_outputs(directory=None, jobs=1, n=SMALL_NUMBER_THRESHOLD):
+    """Checks every released CSV file, using up to `jobs` processes.
+
+    Returns:
+        A table of violations, with VIOLATION_COLUMNS, sorted by file and line.
+    """
+    files = get_released_files(directory)
+    violations = run_jobs(check_file, {path.name: (path, n) for path in files}, jobs, "check")
+    violations = pd.concat(
+        [pd.DataFrame(columns=VIOLATION_COLUMNS), *violations.values()], ignore_index=True
+    )
+    return violations.sort_values(["file", "line"], kind="stable", ignore_index=True)
+
+
+def write_report(violations, path=REPORT_PATH):
+    """Writes the violations to a CSV file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    violations.to_csv(path, index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    add_jobs_argument(parser, "number of worker processes to check files with")
+    parser.add_argument("--directory", type=Path, default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    violations = check_outputs(args.directory, jobs=args.jobs)
+    write_report(violations)
+    write_profile("check_disclosure")
+
+    for violation in violations.head(MAX_PRINTED).itertuples():
+        print(f"{violation.file}:{violation.line}: {violation.column}: {violation.rule}")
+    if len(violations):
+        sys.exit(f"{len(violations)} disclosure control violation(s) found, see {REPORT_PATH}")
+    print(f"No disclosure control violations found in {len(get_released_files(args.directory))} files")
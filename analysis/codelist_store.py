@@ -0,0 +1,152 @@
+"""A store of compiled codelists, so that each codelist CSV is parsed only once.
+
+A codelist is compiled into a directory of .npy files: its codes, sorted, and
+each of its other columns (terms, categories) in the same order.  The
+directory is named after the code column and the hash of the CSV's contents,
+so a new version of a codelist is compiled afresh, and the arrays are
+memory-mapped when loaded.
+
+The store is kept in the temporary directory rather than in output/, as the
+study definitions load codelists too, and their actions may only write the
+outputs they declare.  Each OpenSAFELY action runs in a fresh container, so
+there it is in effect a per-process cache: an action compiles each codelist
+it uses once, however many times it loads it.  Only local runs share the
+compiled codelists between scripts.
+"""
+import hashlib
+import json
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from output_writer import atomic_directory
+
+BASE_DIR = Path(__file__).parents[1]
+STORE_DIR = Path(tempfile.gettempdir()) / "codelist_cache"
+
+_memo = {}
+
+
+class CompiledCodelist:
+    """A codelist's codes, sorted, with an index for looking up their columns.
+
+    Codes are held as strings, as both SNOMED CT and CTV3 codes can be
+    written that way.  Where a code appears more than once, its first row is
+    kept.
+    """
+
+    def __init__(self, code_column, codes, columns):
+        self.code_column = code_column
+        self.codes = codes
+        self.columns = columns
+
+    @classmethod
+    def from_frame(cls, df, code_column="code"):
+        """Compiles a codelist table, stripping whitespace from every value."""
+        df = df.astype(str).apply(lambda column: column.str.strip())
+        df = df.drop_duplicates(code_column)
+        df = df.loc[df[code_column] != ""].sort_values(code_column)
+        return cls(
+            code_column,
+            df[code_column].to_numpy(dtype=str),
+            {
+                column: df[column].to_numpy(dtype=str)
+                for column in df.columns
+                if column != code_column
+            },
+        )
+
+    def __len__(self):
+        return len(self.codes)
+
+    def positions(self, codes):
+        """Gets the positions of the given codes in the codelist, or -1 for
+        codes that aren't in it."""
+        codes = np.asarray(codes).astype(str)
+        if len(self.codes) == 0:
+            return np.full(len(codes), -1)
+        positions = np.minimum(np.searchsorted(self.codes, codes), len(self.codes) - 1)
+        return np.where(self.codes[positions] == codes, positions, -1)
+
+    def lookup(self, codes, column):
+        """Looks up a column (e.g. the term) for the given codes.
+
+        Returns:
+            An object array of values, with None for codes not in the codelist.
+        """
+        positions = self.positions(codes)
+        values = self.columns[column][positions].astype(object)
+        values[positions == -1] = None
+        return values
+
+    def mapping(self, column):
+        """Gets a dict mapping each code to its value in a column, e.g. a category."""
+        return dict(zip(self.codes.tolist(), self.columns[column].tolist()))
+
+    def save(self, directory):
+        """Writes the arrays to a directory.
+
+        The directory is written in full under a temporary name and then
+        renamed, so arrays another process has memory-mapped are never
+        overwritten.
+        """
+        with atomic_directory(directory) as tmp_directory:
+            np.save(tmp_directory / "codes.npy", self.codes)
+            for i, (column, values) in enumerate(self.columns.items()):
+                np.save(tmp_directory / f"column_{i}.npy", values)
+            (tmp_directory / "columns.json").write_text(
+                json.dumps({"code_column": self.code_column, "columns": list(self.columns)})
+            )
+
+    @classmethod
+    def load(cls, directory):
+        """Loads a directory written by save, memory-mapping the arrays."""
+        directory = Path(directory)
+        meta = json.loads((directory / "columns.json").read_text())
+        return cls(
+            meta["code_column"],
+            np.load(directory / "codes.npy", mmap_mode="r"),
+            {
+                column: np.load(directory / f"column_{i}.npy", mmap_mode="r")
+                for i, column in enumerate(meta["columns"])
+            },
+        )
+
+
+def get_compiled_path(path, code_column="code", store_directory=None):
+    """Gets the directory a version of a codelist is compiled to."""
+    path = Path(path)
+    store_directory = Path(store_directory) if store_directory is not None else STORE_DIR
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()[:16]
+    return store_directory / f"{path.stem}-{code_column}-{digest}"
+
+
+def load_codelist(path, code_column="code", store_directory=None):
+    """Loads a codelist, compiling it first if this version hasn't been.
+
+    Args:
+        path: path of the codelist CSV, relative to the repository root if not
+            absolute
+        code_column: name of the code column in the CSV
+        store_directory: directory of compiled codelists, defaults to STORE_DIR
+    Returns:
+        A CompiledCodelist.
+    """
+    path = BASE_DIR / path
+    compiled_path = get_compiled_path(path, code_column, store_directory)
+    if compiled_path in _memo:
+        return _memo[compiled_path]
+
+    if (compiled_path / "columns.json").exists():
+        codelist = CompiledCodelist.load(compiled_path)
+    else:
+        codelist = CompiledCodelist.from_frame(
+            pd.read_csv(path, dtype=str, keep_default_na=False), code_column
+        )
+        try:
+            codelist.save(compiled_path)
+        except OSError:
+            pass
+
+    _memo[compiled_path] = codelist
+    return codelist
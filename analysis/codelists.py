@@ -1,22 +1,31 @@
-from cohortextractor import codelist_from_csv
-from config import codelist_path
+from cohortextractor import codelist as make_codelist
+from codelist_store import load_codelist
+from config import codelist_path, batch_codelists
+
+# Codelists are read through the compiled codelist store, so that each CSV is
+# parsed once however many steps use it
 
 # Change the path of the codelist to your chosen codelist
-codelist = codelist_from_csv(codelist_path, system='snomed')
+codelist = make_codelist(load_codelist(codelist_path).codes.tolist(), system='snomed')
+
+# Codelists analysed alongside it in batch mode, keyed by namespace
+batch_codelist = {
+    namespace: make_codelist(load_codelist(c["codelist_path"]).codes.tolist(), system='snomed')
+    for namespace, c in batch_codelists.items()
+}
 
-ethnicity_codes = codelist_from_csv(
-        "codelists/opensafely-ethnicity.csv",
+_ethnicity = load_codelist("codelists/opensafely-ethnicity.csv", code_column="Code")
+ethnicity_codes = make_codelist(
+        list(zip(_ethnicity.codes.tolist(), _ethnicity.columns["Grouping_6"].tolist())),
         system="ctv3",
-        column="Code",
-        category_column="Grouping_6",
     )
 
-nhse_care_homes_codes = codelist_from_csv("codelists/opensafely-nhs-england-care-homes-residential-status.csv",
+nhse_care_homes_codes = make_codelist(
+    load_codelist("codelists/opensafely-nhs-england-care-homes-residential-status.csv").codes.tolist(),
     system="snomed",
-    column="code",)
+)
 
-ld_codes = codelist_from_csv(
-    "codelists/opensafely-learning-disabilities.csv",
+ld_codes = make_codelist(
+    load_codelist("codelists/opensafely-learning-disabilities.csv", code_column="CTV3Code").codes.tolist(),
     system="ctv3",
-    column="CTV3Code",
-)
\ No newline at end of file
+)
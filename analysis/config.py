@@ -4,6 +4,10 @@ start_date = "2021-06-01"
 #study end date.  should match date in project.yaml
 end_date = "2021-12-01"
 
+#periods (first and last month, inclusive) whose rates are compared in the time-series statistics
+baseline_period = ("2021-06-01", "2021-08-01")
+current_period = ("2021-10-01", "2021-12-01")
+
 #demographic variables by which code use is broken down
 #select from ["sex", "age_band", "region", "imd", "ethnicity", "learning_disability"]
 demographics = ["sex", "age_band", "region", "imd", "ethnicity", "learning_disability", "care_home_status"]
@@ -14,3 +18,13 @@ measure_name = "Systolic blood pressure"
 #codelist path
 codelist_path = "codelists/opensafely-systolic-blood-pressure-qof.csv"
 
+#optional: further codelists to analyse in the same run (batch mode).  Each is keyed
+#by a short namespace, which is added to the names of its columns, measures and output
+#files, e.g. measure_sex_rate_smr.csv and plot_sex_smr.png.  For example:
+#batch_codelists = {
+#    "smr": {
+#        "measure_name": "Structured medication review",
+#        "codelist_path": "codelists/opensafely-structured-medication-review-nhs-england.csv",
+#    },
+#}
+batch_codelists = {}
@@ -18,6 +18,7 @@ from IPython.core.display import HTML as Center
 from config import measure_name, start_date, end_date, demographics, codelist_path
 from IPython.display import Image, display
 from utilities import *
+from measure_io import read_measure
 %matplotlib inline
 
 """
@@ -39,8 +40,6 @@ md(f"All analytical code and output is available for inspection at the [OpenSAFE
 """
 
 get_data = """\
-codelist = pd.read_csv(f'../{codelist_path}')
-
 image_paths = {d: f'../output/joined/plot_{d}.png' for d in demographics}
 image_paths['total'] = '../output/joined/plot_population.png'
 """
@@ -72,7 +71,7 @@ md("## Total Number by GP Practice")
 
 output_practice_plot = """\
 
-practice_table = pd.read_csv('../output/joined/measure_practice_rate.csv', parse_dates=['date']).sort_values(by='date')
+practice_table = read_measure('practice_rate')
 percentage_practices = get_percentage_practices(practice_table)
 display(
     md(f"Percentage of practices with a recording of a code within the codelist during the study period: {percentage_practices}%")
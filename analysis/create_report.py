@@ -0,0 +1,126 @@
+"""Builds the SRO report as a static HTML page, without a Jupyter kernel.
+
+The report has the same sections as SRO_Notebook.ipynb (see create_notebook.py)
+and is assembled from the outputs of the earlier actions, with the charts and
+tables inlined so that the page is self-contained.  A report is written for
+each codelist in the run, with the batch codelists' reports namespaced.
+"""
+import base64
+import html
+import pandas as pd
+from pathlib import Path
+from config import start_date, end_date, demographics
+from measure_manifest import get_codelists, namespaced
+from measure_io import read_measure
+from profiling import stage, write_profile
+from utilities import build_practice_activity_index, get_percentage_practices
+
+BASE_DIR = Path(__file__).parents[1]
+OUTPUT_DIR = BASE_DIR / "output" / "joined"
+REPORT_PATH = OUTPUT_DIR / "SRO_Notebook.html"
+
+STYLE = """\
+body { font-family: sans-serif; max-width: 60em; margin: 2em auto; padding: 0 1em; }
+img { max-width: 100%; }
+table { border-collapse: collapse; }
+th, td { border: 1px solid #ccc; padding: 0.25em 0.5em; text-align: right; }
+"""
+
+
+def _heading(level, text):
+    return f"<h{level}>{html.escape(text)}</h{level}>"
+
+
+def _paragraph(text):
+    return f"<p>{text}</p>"
+
+
+def _link(text, url):
+    return f'<a href="{html.escape(url)}">{html.escape(text)}</a>'
+
+
+def _image(path):
+    """Gets an <img> element with the PNG at path embedded as a data URI."""
+    data = base64.b64encode(Path(path).read_bytes()).decode("ascii")
+    return f'<img src="data:image/png;base64,{data}">'
+
+
+def _table(df):
+    return df.to_html(index=False, na_rep="", border=0)
+
+
+def get_sections(directory=None, namespace=""):
+    """Gets the HTML for each section of the report, in order.
+
+    Args:
+        directory: directory containing the outputs of the earlier actions,
+            defaults to OUTPUT_DIR
+        namespace: namespace of the codelist to report on (see get_codelists)
+    Returns:
+        A list of HTML fragments.
+    """
+    directory = Path(directory) if directory is not None else OUTPUT_DIR
+    measure_name = get_codelists()[namespace]["measure_name"]
+
+    sections = [
+        _heading(1, "Service Restoration Observatory"),
+        _heading(2, f"Changes in {measure_name} between {start_date} and {end_date}"),
+        _paragraph(
+            f"Below are various time-series graphs showing changes in {html.escape(measure_name)} code use."
+        ),
+        _heading(3, "Methods"),
+        _paragraph(
+            f"Using OpenSAFELY-TPP, covering 40% of England's population, we have assessed coding activity related to {html.escape(measure_name)} between {start_date} and {end_date}. The codelist used can be found here at {_link('OpenSAFELY Codelists', 'https://codelists.opensafely.org/')}.  For each month within the study period, we have calculated the rate at which the code was recorded per 1000 registered patients."
+        ),
+        _paragraph(
+            f"All analytical code and output is available for inspection at the {_link('OpenSAFELY GitHub repository', 'https://github.com/opensafely')}"
+        ),
+        _heading(2, f"Total {measure_name} Number"),
+        _image(directory / namespaced("plot_population.png", namespace)),
+        _heading(3, "Sub totals by sub codes"),
+        _paragraph("Events for the top 5 subcodes across the study period"),
+        _table(pd.read_csv(directory / namespaced("top_5_code_table.csv", namespace))),
+        _heading(2, "Total Number by GP Practice"),
+    ]
+
+    practice_table = read_measure(namespaced("practice_rate", namespace), directory, directory / "cache")
+    activity_index = build_practice_activity_index(practice_table)
+    percentage_practices = get_percentage_practices(practice_table, activity_index, directory)
+    sections += [
+        _paragraph(
+            f"Percentage of practices with a recording of a code within the codelist during the study period: {percentage_practices}%"
+        ),
+        _image(directory / namespaced("decile_chart.png", namespace)),
+    ]
+
+    for d in demographics:
+        sections += [
+            _heading(2, f"Breakdown by {d}"),
+            _image(directory / namespaced(f"plot_{d}.png", namespace)),
+        ]
+    return sections
+
+
+def create_report(directory=None, path=None, namespace=""):
+    """Writes the report for a codelist to a single HTML file.
+
+    The path defaults to REPORT_PATH, namespaced for a batch codelist.
+    """
+    path = path if path is not None else REPORT_PATH.with_name(namespaced(REPORT_PATH.name, namespace))
+    measure_name = get_codelists()[namespace]["measure_name"]
+    with stage("create_report", measure=namespace or None):
+        body = "\n".join(get_sections(directory, namespace))
+        Path(path).write_text(
+            "<!DOCTYPE html>\n"
+            '<html>\n<head>\n<meta charset="utf-8">\n'
+            f"<title>Service Restoration Observatory: {html.escape(measure_name)}</title>\n"
+            f"<style>\n{STYLE}</style>\n</head>\n"
+            f"<body>\n{body}\n</body>\n</html>\n",
+            encoding="utf-8",
+        )
+
+
+if __name__ == "__main__":
+    for namespace in get_codelists():
+        create_report(namespace=namespace)
+    write_profile("create_report")
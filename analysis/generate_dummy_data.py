@@ -0,0 +1,183 @@
+"""Generates large dummy input files without cohortextractor.
+
+The `return_expectations` of each variable in the study definitions are read
+from their source (see study_expectations.py), so that cohortextractor need not
+be installed, and values are sampled for whole columns at once with NumPy.  Files are
+written with the same names and columns as the cohortextractor actions in
+project.yaml:
+
+    output/input_<date>.csv.gz                       (generate_study_population)
+    output/input_ethnicity.csv.gz                    (generate_study_population_ethnicity)
+    output/joined/input_practice_count_<date>.csv.gz (generate_study_population_practice_count)
+
+With --joined, the monthly files are also written to output/joined with
+ethnicity already joined, as join_ethnicity would produce.
+
+Run from the repository root, e.g.
+
+    python analysis/generate_dummy_data.py --population-size 2000000 --joined --jobs 4
+"""
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+import config
+from output_writer import write_table
+from study_expectations import BINARY_FUNCTIONS, load_study_definition
+from utilities import add_jobs_argument, run_jobs
+
+BASE_DIR = Path(__file__).parents[1]
+ANALYSIS_DIR = BASE_DIR / "analysis"
+OUTPUT_DIR = BASE_DIR / "output"
+
+# Number of rows of a dummy extract written at a time
+CHUNKSIZE = 1_000_000
+
+
+def _sample_ints(spec, n, rng):
+    """Samples integers from an expectations "int" specification."""
+    distribution = spec.get("distribution")
+    if distribution == "normal":
+        values = rng.normal(spec["mean"], spec["stddev"], n)
+    elif distribution == "population_ages":
+        values = rng.normal(42, 23, n).clip(0, 105)
+    else:
+        raise ValueError(f"Unsupported int distribution: {distribution}")
+    return np.round(values).astype("int64")
+
+
+def _sample_dates(spec, n, rng):
+    """Samples dates from an expectations "date" specification."""
+    earliest = pd.Timestamp(spec.get("earliest", "1900-01-01"))
+    latest = spec.get("latest", "today")
+    latest = pd.Timestamp.today().normalize() if latest == "today" else pd.Timestamp(latest)
+    days = rng.integers(0, (latest - earliest).days + 1, n)
+    return (earliest + pd.to_timedelta(days, unit="D")).strftime("%Y-%m-%d")
+
+
+def generate_variable(variable, n, rng, default_expectations):
+    """Samples n values of a study variable from its expectations."""
+    expectations = {**default_expectations, **variable.expectations}
+    rate = expectations.get("rate")
+    incidence = 1.0 if rate == "universal" else expectations.get("incidence", 1.0)
+    present = rng.random(n) < incidence
+
+    if "category" in variable.expectations:
+        ratios = variable.expectations["category"]["ratios"]
+        categories = np.array(list(ratios), dtype=object)
+        p = np.array(list(ratios.values()), dtype=float)
+        values = categories[rng.choice(len(categories), n, p=p / p.sum())]
+        missing = variable.default_category if variable.default_category is not None else np.nan
+        return pd.Series(np.where(present, values, missing), dtype=object)
+
+    if "int" in variable.expectations:
+        values = _sample_ints(variable.expectations["int"], n, rng)
+        return pd.Series(values).where(present).astype("Int64")
+
+    if variable.returning and "date" in variable.returning:
+        values = _sample_dates(expectations.get("date", {}), n, rng)
+        return pd.Series(values).where(present)
+
+    # Binary flags are 0 rather than missing for patients without the event
+    if variable.returning in (None, "binary_flag") and variable.function in BINARY_FUNCTIONS:
+        return pd.Series(present.astype("int8"))
+
+    raise ValueError(f"Can't generate values for variable: {variable.name}")
+
+
+def generate_study(path, n, rng):
+    """Generates a dummy extract of n patients for a study definition."""
+    default_expectations, _, variables = load_study_definition(path)
+    data = {"patient_id": np.arange(1, n + 1)}
+    for variable in variables:
+        data[variable.name] = generate_variable(variable, n, rng, default_expectations)
+    return pd.DataFrame(data)
+
+
+def get_index_dates():
+    """Gets the first day of each month between the config start and end dates."""
+    return pd.date_range(config.start_date, config.end_date, freq="MS").strftime(
+        "%Y-%m-%d"
+    )
+
+
+def _write_month(date, population_size, seed, output_dir, ethnicity=None):
+    """Writes the dummy extracts for one month."""
+    rng = np.random.default_rng(seed)
+
+    df = generate_study(ANALYSIS_DIR / "study_definition.py", population_size, rng)
+    write_table(df, output_dir / f"input_{date}.csv.gz", chunksize=CHUNKSIZE)
+    if ethnicity is not None:
+        write_table(
+            df.merge(ethnicity, on="patient_id", how="left"),
+            output_dir / "joined" / f"input_{date}.csv.gz",
+            chunksize=CHUNKSIZE,
+        )
+
+    practice_count = generate_study(
+        ANALYSIS_DIR / "study_definition_practice_count.py", population_size, rng
+    )
+    write_table(
+        practice_count,
+        output_dir / "joined" / f"input_practice_count_{date}.csv.gz",
+        chunksize=CHUNKSIZE,
+    )
+    return date
+
+
+def generate_dummy_data(
+    population_size, seed=0, joined=False, output_dir=OUTPUT_DIR, jobs=1
+):
+    """Writes dummy versions of every cohortextractor output the pipeline reads.
+
+    Months are independent, so they can be written by up to `jobs` processes.
+    Each month has its own random seed spawned from `seed`, so the output
+    doesn't depend on the number of jobs.
+    """
+    output_dir = Path(output_dir)
+    dates = get_index_dates()
+    ethnicity_seed, *month_seeds = np.random.SeedSequence(seed).spawn(len(dates) + 1)
+
+    ethnicity = generate_study(
+        ANALYSIS_DIR / "study_definition_ethnicity.py",
+        population_size,
+        np.random.default_rng(ethnicity_seed),
+    )
+    write_table(ethnicity, output_dir / "input_ethnicity.csv.gz", chunksize=CHUNKSIZE)
+
+    run_jobs(
+        _write_month,
+        {
+            date: (date, population_size, month_seed, output_dir, ethnicity if joined else None)
+            for date, month_seed in zip(dates, month_seeds)
+        },
+        jobs,
+        "write dummy data for",
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--population-size",
+        type=int,
+        default=10000,
+        help="number of patients in each extract",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--joined",
+        action="store_true",
+        help="also write monthly files with ethnicity joined to output/joined",
+    )
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR)
+    add_jobs_argument(parser, "number of worker processes to write months with")
+    args = parser.parse_args()
+
+    generate_dummy_data(
+        args.population_size,
+        seed=args.seed,
+        joined=args.joined,
+        output_dir=args.output_dir,
+        jobs=args.jobs,
+    )
@@ -0,0 +1,250 @@
+import argparse
+import itertools
+import pandas as pd
+from pathlib import Path
+from measure_manifest import get_measure_specs
+from refresh_manifest import (
+    GENERATE_MANIFEST,
+    REDACT_MANIFEST,
+    file_hash,
+    get_changed_dates,
+    get_pending_dates,
+    load_refresh_manifest,
+    save_refresh_manifest,
+)
+from output_writer import write_table
+from profiling import stage, write_profile
+from utilities import (
+    OUTPUT_DIR,
+    get_date_input_file,
+    match_input_files,
+    read_input_files,
+)
+
+
+def get_input_columns(specs):
+    """Gets the input file columns needed to calculate the given measures.
+
+    `population` is not a column in the input files: every row belongs to the
+    population, so it is counted rather than read.
+    """
+    columns = []
+    for spec in specs:
+        for column in [*spec.group_by, spec.numerator, spec.denominator]:
+            if column != "population" and column not in columns:
+                columns.append(column)
+    return columns
+
+
+def _get_values(chunk, column):
+    """Gets a numerator or denominator column, counting rows for `population`."""
+    if column == "population" and column not in chunk.columns:
+        return pd.Series(1, index=chunk.index, dtype="int64")
+    return chunk[column].astype("int64")
+
+
+def aggregate_chunk(chunk, specs):
+    """Sums the numerator and denominator of every measure over a chunk.
+
+    Each group_by column is factorised once and shared by every measure that
+    groups by it.
+
+    Returns:
+        A dict of partial measure tables (group_by columns, numerator and
+        denominator sums) keyed by measure ID.
+    """
+    values = {}
+    for spec in specs:
+        for column in [spec.numerator, spec.denominator]:
+            if column not in values:
+                values[column] = _get_values(chunk, column)
+
+    codes = {}
+    partials = {}
+    for spec in specs:
+        numerator = values[spec.numerator]
+        denominator = values[spec.denominator]
+
+        if spec.group_by == ["population"]:
+            partials[spec.id] = pd.DataFrame(
+                {spec.numerator: [numerator.sum()], spec.denominator: [denominator.sum()]}
+            )
+            continue
+
+        (column,) = spec.group_by
+        if column not in codes:
+            codes[column] = pd.factorize(chunk[column])
+        group_codes, uniques = codes[column]
+
+        # Rows with a missing group are left out, as cohortextractor does
+        grouped = group_codes >= 0
+        partials[spec.id] = pd.DataFrame(
+            {
+                column: uniques,
+                spec.numerator: numerator[grouped].groupby(group_codes[grouped]).sum().to_numpy(),
+                spec.denominator: denominator[grouped].groupby(group_codes[grouped]).sum().to_numpy(),
+            }
+        )
+    return partials
+
+
+def combine_partials(partials, spec, date):
+    """Combines partial sums into a measure table in cohortextractor's layout."""
+    df = pd.concat(partials, ignore_index=True)
+    if spec.group_by == ["population"]:
+        df = df.sum().to_frame().T
+    else:
+        df = (
+            df.groupby(spec.group_by, observed=True)
+            .sum()
+            .reset_index()
+        )
+    df["value"] = df[spec.numerator] / df[spec.denominator]
+    df["date"] = date.strftime("%Y-%m-%d")
+    return df
+
+
+def calculate_measures(specs=None, directory=None, chunksize=500_000, dates=None):
+    """Calculates every measure in a single pass over the input files.
+
+    Each monthly input file is streamed once, and every measure's numerator
+    and denominator are summed from the same chunks.
+
+    Args:
+        specs: the measures to calculate, defaults to get_measure_specs()
+        directory: directory containing the input files, defaults to OUTPUT_DIR
+        chunksize: maximum number of rows read at a time
+        dates: optional collection of YYYY-MM-DD dates; only these months are used
+    Returns:
+        A dict of measure tables keyed by measure ID.
+    """
+    specs = get_measure_specs() if specs is None else specs
+    columns = get_input_columns(specs)
+
+    monthly_tables = {spec.id: [] for spec in specs}
+    chunks = read_input_files(
+        columns=columns, directory=directory, chunksize=chunksize, dates=dates
+    )
+    for date, month_chunks in itertools.groupby(chunks, key=lambda x: x[0]):
+        partials = {spec.id: [] for spec in specs}
+        with stage("aggregate_month", month=date.strftime("%Y-%m-%d")) as record:
+            record["rows"] = 0
+            for _, chunk in month_chunks:
+                record["rows"] += len(chunk)
+                for measure_id, partial in aggregate_chunk(chunk, specs).items():
+                    partials[measure_id].append(partial)
+
+        for spec in specs:
+            monthly_tables[spec.id].append(
+                combine_partials(partials[spec.id], spec, date)
+            )
+
+    return {
+        measure_id: pd.concat(tables, ignore_index=True)
+        for measure_id, tables in monthly_tables.items()
+        if tables
+    }
+
+
+def write_measures(tables, directory=None):
+    """Writes measure tables to measure_<id>.csv files."""
+    directory = Path(directory) if directory is not None else OUTPUT_DIR
+    for measure_id, df in tables.items():
+        write_table(df, directory / f"measure_{measure_id}.csv")
+
+
+def _read_existing_measure(path, spec):
+    """Reads a measure table written by an earlier run, dropping any index column.
+
+    Group columns are read as strings and counts as nullable integers, so that
+    the months that are reused are written back exactly as they were read:
+    codes aren't turned into floats, and redacted counts stay blank.
+    """
+    dtypes = {column: str for column in spec.group_by}
+    dtypes.update({spec.numerator: "Int64", spec.denominator: "Int64", "date": str})
+    df = pd.read_csv(path, dtype=dtypes)
+    return df.loc[:, ~df.columns.str.startswith("Unnamed:")]
+
+
+def refresh_measures(specs=None, directory=None, chunksize=500_000, full=False):
+    """Updates the measure tables for new or changed input files only.
+
+    Input files are compared against the hashes recorded in the generate
+    manifest.  Months whose input file is new or has changed are recalculated
+    and merged into the existing measure tables, and months whose input file
+    has been removed are dropped.  If any measure table is missing, or was not
+    last written by this script or by redact_measures.py, every month is
+    recalculated instead.
+
+    The manifest records, for each measure table, the months that have not
+    been redacted yet, so that redact_measures.py can redact only those.  With
+    full=True every month is recalculated, but the manifest is still written,
+    so that a later incremental run can start from it.
+    """
+    specs = get_measure_specs() if specs is None else specs
+    directory = Path(directory) if directory is not None else OUTPUT_DIR
+
+    generate_manifest = load_refresh_manifest(GENERATE_MANIFEST, directory)
+    redact_manifest = load_refresh_manifest(REDACT_MANIFEST, directory)
+
+    input_hashes = {
+        get_date_input_file(file.name): file_hash(file)
+        for file in directory.iterdir()
+        if match_input_files(file.name)
+    }
+    changed, removed = get_changed_dates(generate_manifest["inputs"], input_hashes)
+
+    pending = {}
+    for spec in specs:
+        current_hash = file_hash(directory / f"measure_{spec.id}.csv")
+        pending[spec.id] = get_pending_dates(
+            spec.id, current_hash, generate_manifest, redact_manifest
+        )
+
+    if full or any(dates is None for dates in pending.values()):
+        # Existing tables can't be reused, so start again from every month
+        tables = calculate_measures(specs, directory, chunksize)
+        pending = {spec.id: sorted(input_hashes) for spec in specs}
+    else:
+        new_tables = calculate_measures(specs, directory, chunksize, dates=changed)
+        tables = {}
+        for spec in specs:
+            existing = _read_existing_measure(directory / f"measure_{spec.id}.csv", spec)
+            existing = existing.loc[~existing["date"].isin(changed + removed)]
+            tables[spec.id] = pd.concat(
+                [existing, new_tables.get(spec.id)], ignore_index=True
+            ).sort_values(by="date", kind="stable")
+            pending[spec.id] = sorted(
+                (set(pending[spec.id]) - set(removed)) | set(changed)
+            )
+
+    write_measures(tables, directory)
+
+    save_refresh_manifest(
+        {
+            "inputs": input_hashes,
+            "measures": {
+                measure_id: {
+                    "hash": file_hash(directory / f"measure_{measure_id}.csv"),
+                    "pending_redaction": pending[measure_id],
+                }
+                for measure_id in tables
+            },
+        },
+        GENERATE_MANIFEST,
+        directory,
+    )
+    return tables
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only recalculate months whose input files are new or have changed",
+    )
+    args = parser.parse_args()
+
+    refresh_measures(full=not args.incremental)
+    write_profile("generate_measures")
@@ -1,13 +1,42 @@
-import pandas as pd
 import os
 from redact_measures import measures_dict
-from utilities import OUTPUT_DIR, create_top_5_code_table
-from config import codelist_path
+from utilities import OUTPUT_DIR, create_top_k_code_tables
+from measure_manifest import get_codelists
+from measure_io import read_measure
+from codelist_store import load_codelist
+from output_writer import write_table
+from profiling import stage, write_profile
 
-codelist = pd.read_csv(codelist_path)
 
-for key, value in measures_dict.items():
-    if value.id == 'event_code_rate':
-        df = pd.read_csv(os.path.join(OUTPUT_DIR, 'measure_event_code_rate.csv'), parse_dates=['date']).sort_values(by='date')
-        top_5_code_table = create_top_5_code_table(df=df, code_df=codelist, code_column='code', term_column='term')
-        top_5_code_table.to_csv(os.path.join(OUTPUT_DIR, 'top_5_code_table.csv'), index=False)
\ No newline at end of file
+def generate_top_5_table(df, codelist, measure=None):
+    """Creates the top 5 code tables from an event code measure and writes them.
+
+    Writes the top 5 codes across the study period and the top 5 codes in each
+    month, which are calculated together.  For a batch codelist's measure, the
+    file names are namespaced.
+    """
+    measure = measures_dict['event_code_rate'] if measure is None else measure
+    df = df.rename(columns={measure.group_by[0]: 'event_code', measure.numerator: 'event'})
+
+    top_5_code_table, monthly_top_5_code_table = create_top_k_code_tables(df=df, code_df=codelist, code_column='code', term_column='term', k=5)
+    write_table(top_5_code_table, os.path.join(OUTPUT_DIR, measure.output_name('top_5_code_table.csv')))
+    write_table(monthly_top_5_code_table, os.path.join(OUTPUT_DIR, measure.output_name('top_5_code_table_monthly.csv')))
+    return top_5_code_table
+
+
+def generate_top_5_tables():
+    """Reads each event code measure and writes its top 5 code tables."""
+    codelists = get_codelists()
+
+    for key, value in measures_dict.items():
+        if value.breakdown == 'event_code':
+            codelist = load_codelist(codelists[value.namespace]['codelist_path'])
+            with stage('read_measure', measure=value.id) as record:
+                df = read_measure(value.id)
+                record['rows'] = len(df)
+            generate_top_5_table(df, codelist, value)
+
+
+if __name__ == '__main__':
+    generate_top_5_tables()
+    write_profile('generate_top_5_tables')
@@ -0,0 +1,143 @@
+"""Joins ethnicity onto each monthly input file.
+
+This does what the cohort-joiner action did: each output/input_<date>.csv.gz
+is left-joined to output/input_ethnicity.csv.gz on patient_id and written to
+output/joined with the same name.  The ethnicity extract is loaded once into
+an index sorted by patient_id, with each column stored as categorical codes,
+and the monthly files are streamed through it in chunks.  Months are
+independent, so they can be joined by several processes.
+"""
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from output_writer import write_table
+from profiling import stage, write_profile
+from utilities import add_jobs_argument, get_date_input_file, match_input_files, run_jobs
+
+BASE_DIR = Path(__file__).parents[1]
+INPUT_DIR = BASE_DIR / "output"
+OUTPUT_DIR = INPUT_DIR / "joined"
+ETHNICITY_PATH = INPUT_DIR / "input_ethnicity.csv.gz"
+
+
+class EthnicityIndex:
+    """The ethnicity extract, sorted by patient_id.
+
+    Each column is held as a Categorical, so a patient's values are looked up
+    by position.  Missing values are read as empty strings, so that they are
+    written back exactly as they were read.
+    """
+
+    def __init__(self, patient_ids, columns):
+        self.patient_ids = patient_ids
+        self.columns = columns
+
+    @classmethod
+    def from_csv(cls, path):
+        """Builds the index from the ethnicity extract, which has one row per patient."""
+        df = pd.read_csv(path, dtype="category", keep_default_na=False)
+        patient_ids = df.pop("patient_id").astype("int64").to_numpy()
+        order = np.argsort(patient_ids, kind="stable")
+        return cls(
+            patient_ids[order],
+            {name: column.array.take(order) for name, column in df.items()},
+        )
+
+    def lookup(self, patient_ids):
+        """Gets the positions of patients in the index, or -1 for those not in it."""
+        if len(self.patient_ids) == 0:
+            return np.full(len(patient_ids), -1)
+        positions = np.searchsorted(self.patient_ids, patient_ids)
+        positions = np.minimum(positions, len(self.patient_ids) - 1)
+        return np.where(self.patient_ids[positions] == patient_ids, positions, -1)
+
+    def join(self, chunk):
+        """Left joins the index onto a chunk of a monthly input file."""
+        positions = self.lookup(chunk["patient_id"].astype("int64").to_numpy())
+        joined = {
+            name: pd.Series(values.take(positions, allow_fill=True), index=chunk.index)
+            for name, values in self.columns.items()
+            if name not in chunk.columns
+        }
+        return chunk.assign(**joined)
+
+
+def join_month(input_path, index, output_dir=OUTPUT_DIR, chunksize=500_000):
+    """Streams one monthly input file through the ethnicity index.
+
+    The monthly file is read as text, so its columns are written unchanged.
+
+    Returns:
+        The path of the joined file.
+    """
+    input_path = Path(input_path)
+    output_path = Path(output_dir) / input_path.name
+
+    date = get_date_input_file(input_path.name)
+    with stage("join_month", month=date) as record:
+        with pd.read_csv(
+            input_path, dtype=str, keep_default_na=False, chunksize=chunksize
+        ) as reader:
+            joined = (index.join(chunk) for chunk in reader)
+            record["rows"] = write_table(joined, output_path)["rows"]
+    return output_path
+
+
+# The ethnicity index used by _join_month_job, set when each worker starts
+_job_index = None
+
+
+def _set_job_index(index):
+    global _job_index
+    _job_index = index
+
+
+def _join_month_job(input_path, output_dir, chunksize):
+    """Runs join_month as a job, with the index set by _set_job_index."""
+    join_month(input_path, _job_index, output_dir, chunksize)
+
+
+def join_ethnicity(
+    input_dir=INPUT_DIR,
+    ethnicity_path=ETHNICITY_PATH,
+    output_dir=OUTPUT_DIR,
+    chunksize=500_000,
+    jobs=1,
+):
+    """Joins ethnicity onto every monthly input file in input_dir.
+
+    The ethnicity index is built once and handed to each of up to `jobs`
+    worker processes when it starts.
+    """
+    input_paths = sorted(
+        path for path in Path(input_dir).iterdir() if match_input_files(path.name)
+    )
+
+    with stage("load_ethnicity") as record:
+        index = EthnicityIndex.from_csv(ethnicity_path)
+        record["rows"] = len(index.patient_ids)
+
+    run_jobs(
+        _join_month_job,
+        {path.name: (path, output_dir, chunksize) for path in input_paths},
+        jobs,
+        "join ethnicity onto",
+        initializer=_set_job_index,
+        initargs=(index,),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    add_jobs_argument(parser, "number of worker processes to join months with")
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=500_000,
+        help="maximum number of rows of a monthly file to hold in memory",
+    )
+    args = parser.parse_args()
+
+    join_ethnicity(chunksize=args.chunksize, jobs=args.jobs)
+    write_profile("join_ethnicity")
@@ -0,0 +1,141 @@
+import pandas as pd
+from pathlib import Path
+from measure_manifest import get_measure_specs
+from output_writer import atomic_path
+from refresh_manifest import file_hash
+from study_expectations import get_input_dtypes
+
+BASE_DIR = Path(__file__).parents[1]
+OUTPUT_DIR = BASE_DIR / "output" / "joined"
+CACHE_DIR = OUTPUT_DIR / "cache"
+
+
+def get_measure_path(measure_id, directory=None):
+    """Gets the path of the CSV file for the given measure."""
+    directory = Path(directory) if directory is not None else OUTPUT_DIR
+    return directory / f"measure_{measure_id}.csv"
+
+
+def get_cache_path(measure_id, directory=None):
+    """Gets the path of the columnar cache file for the given measure."""
+    directory = Path(directory) if directory is not None else CACHE_DIR
+    return directory / f"measure_{measure_id}.feather"
+
+
+def get_measure_dtypes(measure_id):
+    """Gets the dtypes of the columns in a measure table.
+
+    Group columns take the dtype of the input column they come from, counts are
+    read as nullable Int32 (redacted counts are blank) and rates as float32.
+    The date column is parsed separately, by read_measure_csv.
+    """
+    dtypes = {"value": "float32"}
+    for spec in get_measure_specs():
+        if spec.id == measure_id:
+            input_dtypes = get_input_dtypes()
+            for column in spec.group_by:
+                dtypes[column] = input_dtypes.get(column, "category")
+            dtypes[spec.numerator] = "Int32"
+            dtypes[spec.denominator] = "Int32"
+    return dtypes
+
+
+def read_measure_csv(measure_id, directory=None):
+    """Reads a measure CSV with the dtypes from get_measure_dtypes.
+
+    Dates are parsed with their fixed YYYY-MM-DD format, and any index column
+    written by an earlier step is dropped.  Rows are kept in file order.
+    """
+    df = pd.read_csv(
+        get_measure_path(measure_id, directory), dtype=get_measure_dtypes(measure_id)
+    )
+    df = df.loc[:, ~df.columns.str.startswith("Unnamed:")]
+    df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d")
+    return df
+
+
+def _prepare_for_cache(df, date_column="date"):
+    """Sorts by date and converts string columns to categoricals."""
+    df = df.sort_values(by=date_column, kind="stable").reset_index(drop=True)
+    for column in df.columns:
+        if column != date_column and (
+            pd.api.types.is_object_dtype(df[column])
+            or pd.api.types.is_string_dtype(df[column])
+        ):
+            df[column] = df[column].astype("category")
+    return df
+
+
+def write_measure_cache(df, measure_id, directory=None, cache_directory=None):
+    """Writes a measure table to the columnar cache.
+
+    The cache is an Arrow IPC (Feather) file holding the table sorted by date,
+    with string columns stored as categoricals.  It records the SHA-256 hash of
+    the measure CSV it was written alongside, so that a cache that no longer
+    matches its CSV, even where the CSV's size is unchanged, is ignored by
+    read_measure.  The file is replaced
+    atomically, and nothing is written if pyarrow is not installed.
+
+    Args:
+        df: A measure table, as written to the measure CSV.
+        measure_id: The measure ID.
+        directory: directory containing the measure CSV, defaults to OUTPUT_DIR
+        cache_directory: directory to write the cache to, defaults to CACHE_DIR
+    Returns:
+        The path of the cache file, or None if it was not written.
+    """
+    try:
+        import pyarrow as pa
+        from pyarrow import feather
+    except ImportError:
+        return None
+
+    csv_path = get_measure_path(measure_id, directory)
+    cache_path = get_cache_path(measure_id, cache_directory)
+
+    table = pa.Table.from_pandas(_prepare_for_cache(df), preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b"source_sha256"] = file_hash(csv_path).encode()
+    with atomic_path(cache_path) as tmp_path:
+        feather.write_feather(table.replace_schema_metadata(metadata), tmp_path)
+    return cache_path
+
+
+def _read_cache(measure_id, directory, cache_directory):
+    """Reads the cached measure table, or returns None if it is missing or stale."""
+    try:
+        from pyarrow import feather, ipc
+    except ImportError:
+        return None
+
+    csv_path = get_measure_path(measure_id, directory)
+    cache_path = get_cache_path(measure_id, cache_directory)
+    if not cache_path.exists() or not csv_path.exists():
+        return None
+
+    # Hashing the CSV is much cheaper than parsing it
+    with ipc.open_file(cache_path) as reader:
+        source_hash = (reader.schema.metadata or {}).get(b"source_sha256")
+    if source_hash is None or source_hash.decode() != file_hash(csv_path):
+        return None
+    return feather.read_table(cache_path).to_pandas()
+
+
+def read_measure(measure_id, directory=None, cache_directory=None):
+    """Reads a measure table, preferring the columnar cache.
+
+    Falls back to parsing the measure CSV when there is no up-to-date cache.
+    Either way, the table is returned sorted by date.
+
+    Args:
+        measure_id: The measure ID.
+        directory: directory containing the measure CSV, defaults to OUTPUT_DIR
+        cache_directory: directory containing the cache, defaults to CACHE_DIR
+    Returns:
+        A measure table.
+    """
+    df = _read_cache(measure_id, directory, cache_directory)
+    if df is not None:
+        return df
+
+    return read_measure_csv(measure_id, directory).sort_values(by="date", kind="stable")
@@ -0,0 +1,143 @@
+import json
+from pathlib import Path
+from typing import NamedTuple
+from config import batch_codelists, codelist_path, demographics, measure_name
+
+BASE_DIR = Path(__file__).parents[1]
+MANIFEST_PATH = BASE_DIR / "output" / "measures.json"
+
+
+class MeasureSpec(NamedTuple):
+    """The parts of a cohortextractor Measure that post-processing needs.
+
+    group_by is always a list; the whole-population measure is grouped by
+    ["population"].
+    """
+
+    id: str
+    numerator: str
+    denominator: str
+    group_by: list
+    small_number_suppression: bool = False
+    # The batch codelist the measure is for, or "" for config.codelist_path
+    namespace: str = ""
+
+    def to_measure_kwargs(self):
+        """Returns keyword arguments for constructing a cohortextractor Measure."""
+        kwargs = self._asdict()
+        del kwargs["namespace"]
+        if self.group_by == ["population"]:
+            kwargs["group_by"] = "population"
+        return kwargs
+
+    @property
+    def breakdown(self):
+        """The group_by column without the namespace, e.g. "event_code"."""
+        column = self.group_by[0]
+        suffix = f"_{self.namespace}"
+        if self.namespace and column.endswith(suffix):
+            return column[: -len(suffix)]
+        return column
+
+    def output_name(self, filename):
+        """Adds the measure's namespace to the name of an output file."""
+        return namespaced(filename, self.namespace)
+
+
+def namespaced(name, namespace):
+    """Adds a batch codelist's namespace to a column, measure ID or file name.
+
+    The namespace goes before any file extension, e.g. plot_sex_smr.png.  Names
+    are unchanged for the empty namespace of config.codelist_path.
+    """
+    if not namespace:
+        return name
+    stem, dot, extension = name.partition(".")
+    return f"{stem}_{namespace}{dot}{extension}"
+
+
+def get_codelists():
+    """Gets the measure name and codelist path of every codelist in the run.
+
+    Returns:
+        A dict keyed by namespace, starting with config.codelist_path under the
+        namespace "" and followed by config.batch_codelists.
+    """
+    codelists = {"": {"measure_name": measure_name, "codelist_path": codelist_path}}
+    codelists.update(batch_codelists)
+    return codelists
+
+
+def get_measure_specs():
+    """Returns the specs of the measures generated for this study.
+
+    The analysis scripts get the study's measures from here, so that they
+    don't have to import cohortextractor.  The specs are read from the
+    manifest at MANIFEST_PATH, written by the write_measure_manifest action
+    that every post-processing action needs; they are only built from the
+    config if no manifest has been written yet.
+    """
+    if MANIFEST_PATH.exists():
+        return load_manifest(MANIFEST_PATH)
+    return build_measure_specs()
+
+
+def build_measure_specs():
+    """Builds the specs of the measures from the config.
+
+    This is the single definition of the study's measures: study_definition
+    builds its Measures from it, and write_manifest serialises it.  Every
+    codelist in get_codelists() has the same measures, calculated from
+    its own event and event_code columns.
+    """
+    specs = []
+    for namespace in get_codelists():
+        specs += _get_codelist_measure_specs(namespace)
+    return specs
+
+
+def _get_codelist_measure_specs(namespace):
+    """Returns the specs of the measures for a single codelist."""
+    event = namespaced("event", namespace)
+
+    def spec(measure_id, group_by):
+        return MeasureSpec(
+            id=namespaced(measure_id, namespace),
+            numerator=event,
+            denominator="population",
+            group_by=group_by,
+            namespace=namespace,
+        )
+
+    specs = [
+        # events broken down by code
+        spec("event_code_rate", [namespaced("event_code", namespace)]),
+        # events broken down by practice
+        spec("practice_rate", ["practice"]),
+        # population rate
+        spec("population_rate", ["population"]),
+    ]
+
+    # Add demographics measures
+    for d in demographics:
+        specs.append(spec(f"{d}_rate", [d]))
+
+    return specs
+
+
+def write_manifest(specs=None, path=MANIFEST_PATH):
+    """Serialises measure specs to a JSON manifest."""
+    specs = build_measure_specs() if specs is None else specs
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"measures": [spec._asdict() for spec in specs]}, indent=2))
+    return path
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Loads measure specs from a JSON manifest."""
+    return [MeasureSpec(**spec) for spec in json.loads(Path(path).read_text())["measures"]]
+
+
+if __name__ == "__main__":
+    write_manifest()
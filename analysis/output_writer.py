@@ -0,0 +1,192 @@
+"""Writes output tables atomically, recording their row counts and checksums.
+
+A table is written to a temporary file alongside its destination, a chunk at
+a time, and renamed over the destination only once it is complete, so a
+crash never leaves a truncated file where a later stage will read it.  The
+format follows the file name: .csv, .csv.gz, or .feather (which needs
+pyarrow).  The row count, size and SHA-256 hash of each file written are
+recorded in OUTPUT_RECORDS_DIR, next to the file.
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+import pandas as pd
+
+OUTPUT_RECORDS_DIR = ".output_records"
+
+# Writing rather than disk space is the bottleneck for the large gzipped files
+COMPRESSLEVEL = 1
+
+
+@contextmanager
+def atomic_path(path):
+    """Yields a temporary path to write to, which replaces `path` on success.
+
+    If the block raises, the temporary file is removed and `path` is left as
+    it was.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+@contextmanager
+def atomic_directory(path):
+    """Yields a temporary directory to write to, which is renamed to `path` on
+    success.
+
+    If `path` was written by another process in the meantime, that directory
+    is kept.  If the block raises, the temporary directory is removed and
+    `path` is left as it was.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = Path(tempfile.mkdtemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"))
+    try:
+        yield tmp_path
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            if not path.is_dir():
+                raise
+    finally:
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+
+
+class _HashingWriter(io.RawIOBase):
+    """A binary file wrapper that hashes and counts the bytes written through it."""
+
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.digest.update(b)
+        self.size += len(b)
+        return self.f.write(b)
+
+
+def _iter_chunks(table, chunksize):
+    """Splits a table into chunks, or passes an iterable of chunks through."""
+    if isinstance(table, pd.DataFrame):
+        if len(table) == 0:
+            yield table
+        for start in range(0, len(table), chunksize):
+            yield table.iloc[start : start + chunksize]
+    else:
+        yield from table
+
+
+def _write_csv(chunks, f, compress, compresslevel):
+    """Streams chunks as CSV to a binary file.  Returns the number of rows."""
+    rows = 0
+    binary = gzip.GzipFile(fileobj=f, mode="wb", compresslevel=compresslevel, mtime=0) if compress else f
+    text = io.TextIOWrapper(binary, encoding="utf-8", newline="", write_through=True)
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(text, index=False, header=i == 0)
+        rows += len(chunk)
+    text.flush()
+    text.detach()
+    if compress:
+        # Writes the gzip trailer, but leaves the file under it open
+        binary.close()
+    return rows
+
+
+def _write_feather(chunks, f):
+    """Streams chunks as an Arrow IPC (Feather) file.  Returns the number of rows."""
+    import pyarrow as pa
+
+    rows = 0
+    writer = None
+    for chunk in chunks:
+        batch = pa.RecordBatch.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pa.ipc.new_file(f, batch.schema)
+        writer.write_batch(batch)
+        rows += len(chunk)
+    if writer is not None:
+        writer.close()
+    return rows
+
+
+def get_record_path(path):
+    """Gets the path of the record of a file written by write_table."""
+    path = Path(path)
+    return path.parent / OUTPUT_RECORDS_DIR / f"{path.name}.json"
+
+
+def write_table(table, path, chunksize=500_000, compresslevel=COMPRESSLEVEL):
+    """Writes a table atomically, without its index.
+
+    Args:
+        table: a DataFrame, or an iterable of DataFrame chunks with the same
+            columns (such as a chunked reader)
+        path: the file to write; its name decides the format
+        chunksize: number of rows of a DataFrame to write at a time
+        compresslevel: gzip compression level for .csv.gz files
+    Returns:
+        The record of the file: its row count, size in bytes and SHA-256 hash.
+    """
+    path = Path(path)
+    chunks = _iter_chunks(table, chunksize)
+
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "wb") as raw:
+            f = _HashingWriter(raw)
+            if path.name.endswith(".csv.gz"):
+                rows = _write_csv(chunks, f, True, compresslevel)
+            elif path.suffix == ".csv":
+                rows = _write_csv(chunks, f, False, compresslevel)
+            elif path.suffix == ".feather":
+                rows = _write_feather(chunks, f)
+            else:
+                raise ValueError(f"Unsupported output format: {path.name}")
+
+    record = {"rows": rows, "bytes": f.size, "sha256": f.digest.hexdigest()}
+    record_path = get_record_path(path)
+    record_path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_path(record_path) as tmp_path:
+        tmp_path.write_text(json.dumps(record, indent=2))
+    return record
+
+
+def read_record(path):
+    """Reads the record of a file written by write_table, or returns None."""
+    record_path = get_record_path(path)
+    if not record_path.exists():
+        return None
+    return json.loads(record_path.read_text())
+
+
+def verify_output(path):
+    """Checks that a file is exactly as write_table last wrote it."""
+    path = Path(path)
+    record = read_record(path)
+    if record is None or not path.exists() or path.stat().st_size != record["bytes"]:
+        return False
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest() == record["sha256"]
@@ -1,33 +1,78 @@
+import matplotlib
+matplotlib.use('Agg')
+
+import argparse
 from utilities import *
-import pandas as pd
-import os
-from ebmdatalab import charts
+import numpy as np
 from redact_measures import measures_dict
+from measure_io import read_measure
+from output_writer import write_table
+from practice_matrix import PracticeMatrix
+from profiling import stage, write_profile
 
-for key, value in measures_dict.items():
-    
-    df = pd.read_csv(os.path.join(OUTPUT_DIR, f'measure_{value.id}.csv'), parse_dates=['date']).sort_values(by='date')
-    df = drop_missing_demographics(df, value.group_by[0])
+
+def plot_measure(df, measure):
+    """Writes the plots (and practice rate and decile tables) for a single redacted measure."""
+    df = drop_missing_demographics(df, measure.group_by[0])
+    breakdown = measure.breakdown
     
     # get total population rate
-    if value.id=='practice_rate':
+    if breakdown=='practice':
         
-        df = drop_irrelevant_practices(df, 'practice')
-        df.to_csv(OUTPUT_DIR / f'rate_table_{value.group_by[0]}.csv', index=False)
-
-        charts.deciles_chart(
-        df,
-        period_column='date',
-        column='event',
-        title='Decile Chart',
-        ylabel='Proportion of population',
-        show_outer_percentiles=False,
-        show_legend=True,
-        ).savefig(OUTPUT_DIR / 'decile_chart.png', bbox_inches='tight')  
+        # Relevance filtering and the deciles both read from one activity index
+        matrix = PracticeMatrix.from_frame(df, measure.numerator, measure.denominator)
+        activity_index = build_practice_activity_index(matrix, 'practice')
+        relevant = drop_irrelevant_practices(matrix, 'practice', activity_index)
+        write_table(relevant.to_frame(), OUTPUT_DIR / measure.output_name('rate_table_practice.csv'))
+
+        # Rounded, like the other released tables; the chart is drawn from the same table
+        deciles = compute_deciles(matrix, column=measure.numerator, activity_index=activity_index)
+        deciles[measure.numerator] = np.round(deciles[measure.numerator], 2)
+        write_table(deciles, OUTPUT_DIR / measure.output_name('decile_table.csv'))
+        plot_deciles(deciles, measure.output_name('decile_chart.png'), title='Decile Chart', y_label='Proportion of population', column=measure.numerator)
         
-    elif value.id=='population_rate':
-        plot_measures(df, filename=f'plot_{value.group_by[0]}.png', title=f'Breakdown by {value.group_by[0]}', column_to_plot='value', category=False, y_label='Proportion')
+    elif breakdown=='population':
+        plot_measures(df, filename=measure.output_name('plot_population.png'), title='Breakdown by population', column_to_plot='value', category=False, y_label='Proportion')
         
     else:
-        plot_measures(df, filename=f'plot_{value.group_by[0]}.png', title=f'Breakdown by {value.group_by[0]}', column_to_plot='value', category=value.group_by[0], y_label='Proportion')
-        
\ No newline at end of file
+        plot_measures(df, filename=measure.output_name(f'plot_{breakdown}.png'), title=f'Breakdown by {breakdown}', column_to_plot='value', category=measure.group_by[0], y_label='Proportion')
+
+
+def _plot_measure_job(key, df=None):
+    """Plots a measure as a job, reading its table if not given."""
+    measure = measures_dict[key]
+    if df is None:
+        with stage('read_measure', measure=measure.id) as record:
+            df = read_measure(measure.id)
+            record['rows'] = len(df)
+    with stage('plot_measure', measure=measure.id, rows=len(df)):
+        plot_measure(df, measure)
+
+
+def plot_all_measures(tables=None, jobs=1):
+    """Plots every measure in measures_dict, using up to `jobs` processes.
+
+    Args:
+        tables: optional dict of measure tables keyed by measure ID; measures
+            not in it are read with read_measure
+        jobs: number of worker processes
+    """
+    tables = {} if tables is None else tables
+    run_jobs(
+        _plot_measure_job,
+        {key: (key, tables.get(key)) for key in measures_dict},
+        jobs,
+        'plot measure',
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    add_jobs_argument(parser, "number of worker processes to render plots with")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    plot_all_measures(jobs=args.jobs)
+    write_profile('plot_measures')
@@ -0,0 +1,136 @@
+"""A practice measure table held as practice x month arrays.
+
+In the long measure table every row repeats its practice and date.  Here the
+practice ids are held once, as a sorted int32 index, the months once, as a
+sorted date index, and the numerator, denominator and rate as 2D arrays with a
+row per practice and a column per month.  Missing and redacted values, and
+months a practice has no row in, are NaN.
+
+build_practice_activity_index, drop_irrelevant_practices, get_number_practices
+and compute_deciles in utilities accept a PracticeMatrix in place of the long
+table.  Redaction is applied to the long table only.
+"""
+import numpy as np
+import pandas as pd
+
+
+class PracticeMatrix:
+    """Numerator, denominator and rate arrays indexed by practice and month.
+
+    Attributes:
+        practices: sorted int32 array of practice ids
+        months: sorted DatetimeIndex of months
+        event, population, value: float arrays of shape
+            (len(practices), len(months))
+        present: boolean array of the same shape, True where the long table
+            has a row
+        numerator, denominator: names of the count columns in the long table
+    """
+
+    def __init__(
+        self,
+        practices,
+        months,
+        event,
+        population,
+        value,
+        present,
+        numerator="event",
+        denominator="population",
+    ):
+        self.practices = practices
+        self.months = months
+        self.event = event
+        self.population = population
+        self.value = value
+        self.present = present
+        self.numerator = numerator
+        self.denominator = denominator
+
+    @classmethod
+    def from_frame(
+        cls,
+        df,
+        numerator="event",
+        denominator="population",
+        practice_col="practice",
+        date_col="date",
+    ):
+        """Builds the matrix from a long practice measure table.
+
+        Rows with a missing practice or date are dropped.  The table should
+        have at most one row for each practice and month.
+        """
+        df = df.loc[df[practice_col].notna() & df[date_col].notna()]
+        practices, practice_index = np.unique(
+            df[practice_col].to_numpy(dtype=np.int64), return_inverse=True
+        )
+        month_index, months = pd.factorize(df[date_col], sort=True)
+        shape = (len(practices), len(months))
+
+        def to_array(column):
+            values = np.full(shape, np.nan)
+            values[practice_index, month_index] = df[column].to_numpy(
+                dtype=float, na_value=np.nan
+            )
+            return values
+
+        present = np.zeros(shape, dtype=bool)
+        present[practice_index, month_index] = True
+        return cls(
+            practices.astype(np.int32),
+            pd.DatetimeIndex(months),
+            to_array(numerator),
+            to_array(denominator),
+            to_array("value"),
+            present,
+            numerator,
+            denominator,
+        )
+
+    def to_frame(self, practice_col="practice", date_col="date"):
+        """Converts the matrix back to a long practice measure table.
+
+        There is a row for each practice and month present, sorted by date
+        then practice, with counts as nullable Int32 and the rate as float32.
+        """
+        month_index, practice_index = np.nonzero(self.present.T)
+        return pd.DataFrame(
+            {
+                practice_col: self.practices[practice_index],
+                self.numerator: pd.array(
+                    self.event[practice_index, month_index], dtype="Int32"
+                ),
+                self.denominator: pd.array(
+                    self.population[practice_index, month_index], dtype="Int32"
+                ),
+                "value": self.value[practice_index, month_index].astype(np.float32),
+                date_col: self.months[month_index],
+            }
+        )
+
+    def __len__(self):
+        return len(self.practices)
+
+    def __getitem__(self, column):
+        """Gets the array for a column of the long table: the numerator,
+        the denominator or "value"."""
+        arrays = {
+            self.numerator: self.event,
+            self.denominator: self.population,
+            "value": self.value,
+        }
+        return arrays[column]
+
+    def select(self, practices):
+        """Returns the matrix for the practices selected by a boolean mask."""
+        return PracticeMatrix(
+            self.practices[practices],
+            self.months,
+            self.event[practices],
+            self.population[practices],
+            self.value[practices],
+            self.present[practices],
+            self.numerator,
+            self.denominator,
+        )
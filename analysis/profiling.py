@@ -0,0 +1,112 @@
+import cProfile
+import csv
+import functools
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+BASE_DIR = Path(__file__).parents[1]
+PROFILE_DIR = BASE_DIR / "output" / "profile"
+
+# Set to the name of a stage to write a cProfile dump of it to PROFILE_DIR
+CPROFILE_ENV_VAR = "SRO_CPROFILE"
+
+FIELDS = ["stage", "measure", "month", "rows", "wall_s", "cpu_s", "peak_rss_mib", "pid"]
+
+_records = []
+
+
+def _peak_rss_mib():
+    """Gets the peak resident set size of this process so far, in MiB."""
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+@contextmanager
+def stage(name, measure=None, rows=None, month=None):
+    """Records the wall time, CPU time, rows processed and peak RSS of a block.
+
+    The record is yielded so that the block can fill in `rows` once it knows
+    them.  Peak RSS is the process's high-water mark at the end of the stage.
+    If the SRO_CPROFILE environment variable is set to `name`, the block is
+    also run under cProfile and the stats are dumped to PROFILE_DIR.
+    """
+    record = {"stage": name, "measure": measure, "month": month, "rows": rows}
+
+    profiler = None
+    if os.environ.get(CPROFILE_ENV_VAR) == name:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    finally:
+        record["wall_s"] = round(time.perf_counter() - wall_start, 4)
+        record["cpu_s"] = round(time.process_time() - cpu_start, 4)
+        record["peak_rss_mib"] = _peak_rss_mib()
+        record["pid"] = os.getpid()
+        _records.append(record)
+
+        if profiler is not None:
+            profiler.disable()
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            suffix = f"_{measure}" if measure else ""
+            profiler.dump_stats(PROFILE_DIR / f"{name}{suffix}_{os.getpid()}.prof")
+
+
+def profiled(func):
+    """Decorates a function so that each call is recorded as a stage.
+
+    If the first argument (positional or keyword) is a DataFrame, Series or
+    array, its length is recorded as the number of rows processed.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        first = args[0] if args else next(iter(kwargs.values()), None)
+        rows = len(first) if isinstance(first, (pd.DataFrame, pd.Series, np.ndarray)) else None
+        with stage(func.__name__, rows=rows):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def collect():
+    """Returns the records made so far in this process, and clears them.
+
+    Worker processes return these to the parent, which passes them to extend.
+    """
+    records = list(_records)
+    _records.clear()
+    return records
+
+
+def extend(records):
+    """Adds records collected in another process."""
+    _records.extend(records)
+
+
+def write_profile(name, directory=None):
+    """Writes the records made so far to <name>.json and <name>.csv, and clears them."""
+    directory = Path(directory) if directory is not None else PROFILE_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    records = collect()
+
+    (directory / f"{name}.json").write_text(json.dumps(records, indent=2))
+    with open(directory / f"{name}.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(records)
+    return records
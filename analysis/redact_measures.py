@@ -1,19 +1,132 @@
+import argparse
 import pandas as pd
 from pathlib import Path
-from study_definition import measures
-from utilities import redact_small_numbers
+from measure_manifest import get_measure_specs
+from utilities import add_jobs_argument, redact_small_numbers, run_jobs
+from measure_io import read_measure_csv, write_measure_cache
+from output_writer import write_table
+from profiling import stage, write_profile
+from refresh_manifest import (
+    GENERATE_MANIFEST,
+    REDACT_MANIFEST,
+    file_hash,
+    get_pending_dates,
+    load_refresh_manifest,
+    save_refresh_manifest,
+)
 
 BASE_DIR = Path(__file__).parents[1]
 OUTPUT_DIR = BASE_DIR / "output/joined"
 
 measures_dict = {}
 
-for m in measures:
+for m in get_measure_specs():
     measures_dict[m.id] = m
 
+
+def redact_measure(measure_id, numerator, denominator, dates=None):
+    """Reads, redacts and overwrites the measure table for a single measure.
+
+    If `dates` is given, only rows for those YYYY-MM-DD dates are redacted and
+    the rest of the table is assumed to be redacted already.
+
+    Returns the redacted measure table.
+    """
+    with stage('read_measure', measure=measure_id) as record:
+        df = read_measure_csv(measure_id, OUTPUT_DIR).sort_values(by='date', kind='stable')
+        record['rows'] = len(df)
+
+    if dates is None:
+        df = redact_small_numbers(df, 5, numerator, denominator, 'value', 'date')
+    else:
+        to_redact = df['date'].isin(pd.to_datetime(list(dates)))
+        df = pd.concat(
+            [df.loc[~to_redact], redact_small_numbers(df.loc[to_redact], 5, numerator, denominator, 'value', 'date')]
+        ).sort_values(by='date', kind='stable')
+
+    with stage('write_measure', measure=measure_id, rows=len(df)):
+        write_table(df, OUTPUT_DIR / f'measure_{measure_id}.csv')
+        write_measure_cache(df, measure_id, OUTPUT_DIR, OUTPUT_DIR / 'cache')
+    return df
+
+
+def _redact_measure_job(measure_id, numerator, denominator, dates=None):
+    """Runs redact_measure as a job, without sending the table back from a
+    worker process."""
+    redact_measure(measure_id, numerator, denominator, dates)
+
+
+def get_dates_to_redact():
+    """Gets the dates still to be redacted in each measure table, using the
+    refresh manifests.
+
+    Measures with no dates left to redact are left out; a date list of None
+    means the whole table must be redacted.
+    """
+    generate_manifest = load_refresh_manifest(GENERATE_MANIFEST, OUTPUT_DIR)
+    redact_manifest = load_refresh_manifest(REDACT_MANIFEST, OUTPUT_DIR)
+
+    dates_to_redact = {}
+    for key in measures_dict:
+        current_hash = file_hash(OUTPUT_DIR / f'measure_{key}.csv')
+        dates = get_pending_dates(key, current_hash, generate_manifest, redact_manifest)
+        if dates != []:
+            dates_to_redact[key] = dates
+    return dates_to_redact
+
+
+def record_redacted_measures(keys):
+    """Records the hashes of the given redacted measure tables in the redact manifest."""
+    redact_manifest = load_refresh_manifest(REDACT_MANIFEST, OUTPUT_DIR)
+    for key in keys:
+        redact_manifest['measures'][key] = {'hash': file_hash(OUTPUT_DIR / f'measure_{key}.csv')}
+    save_refresh_manifest(redact_manifest, REDACT_MANIFEST, OUTPUT_DIR)
+
+
+def redact_measures(jobs=1, incremental=False):
+    """Redacts every measure in measures_dict, using up to `jobs` processes.
+
+    Measures are independent, so each one is written by whichever worker
+    handles it.  If any measure fails, the remaining work is cancelled and a
+    RuntimeError naming the failed measure is raised.  Each table is replaced
+    atomically, so none is left half written, but the tables of measures that
+    were redacted before the failure keep their redacted versions.
+
+    In incremental mode, only the months that generate_measures.py has
+    recalculated since the last redaction are redacted.  Either way, the hash
+    of each table written is recorded in the redact manifest.
+    """
+    if incremental:
+        dates_to_redact = get_dates_to_redact()
+    else:
+        dates_to_redact = {key: None for key in measures_dict}
+
+    run_jobs(
+        _redact_measure_job,
+        {
+            key: (value.id, value.numerator, value.denominator, dates_to_redact[key])
+            for key, value in measures_dict.items()
+            if key in dates_to_redact
+        },
+        jobs,
+        'redact measure',
+    )
+
+    record_redacted_measures(dates_to_redact)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    add_jobs_argument(parser, "number of worker processes to redact measures with")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only redact months recalculated since the last redaction",
+    )
+    return parser.parse_args()
+
+
 if __name__ == '__main__':
-    for key, value in measures_dict.items():
-        
-        df = pd.read_csv(OUTPUT_DIR / f'measure_{value.id}.csv', parse_dates=['date']).sort_values(by='date')
-        df = redact_small_numbers(df, 5, value.numerator, value.denominator, 'value', 'date')
-        df.to_csv(OUTPUT_DIR / f'measure_{value.id}.csv')
\ No newline at end of file
+    args = parse_args()
+    redact_measures(jobs=args.jobs, incremental=args.incremental)
+    write_profile('redact_measures')
@@ -0,0 +1,81 @@
+import hashlib
+import json
+from pathlib import Path
+from output_writer import atomic_path
+
+BASE_DIR = Path(__file__).parents[1]
+OUTPUT_DIR = BASE_DIR / "output" / "joined"
+
+# Written by generate_measures.py: hashes of the input files the measures were
+# calculated from, and of each measure table it wrote, along with the dates in
+# that table that have not been redacted yet.
+GENERATE_MANIFEST = "refresh_manifest_generate.json"
+
+# Written by redact_measures.py: hashes of each measure table it wrote.
+REDACT_MANIFEST = "refresh_manifest_redact.json"
+
+
+def file_hash(path):
+    """Gets the SHA-256 hash of a file's contents, or None if it doesn't exist."""
+    path = Path(path)
+    if not path.exists():
+        return None
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_refresh_manifest(name, directory=None):
+    """Loads a refresh manifest, or returns an empty one if it doesn't exist."""
+    directory = Path(directory) if directory is not None else OUTPUT_DIR
+    path = directory / name
+    if not path.exists():
+        return {"inputs": {}, "measures": {}}
+    return json.loads(path.read_text())
+
+
+def save_refresh_manifest(manifest, name, directory=None):
+    """Writes a refresh manifest, replacing any existing one atomically."""
+    directory = Path(directory) if directory is not None else OUTPUT_DIR
+    with atomic_path(directory / name) as tmp_path:
+        tmp_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+
+
+def get_changed_dates(previous_hashes, current_hashes):
+    """Compares input file hashes keyed by date.
+
+    Returns:
+        A tuple of (changed, removed) sorted lists of dates, where changed
+        dates are new or have different contents, and removed dates no longer
+        have an input file.
+    """
+    changed = sorted(
+        date
+        for date, file_hash in current_hashes.items()
+        if previous_hashes.get(date) != file_hash
+    )
+    removed = sorted(set(previous_hashes) - set(current_hashes))
+    return changed, removed
+
+
+def get_pending_dates(measure_id, current_hash, generate_manifest, redact_manifest):
+    """Gets the dates in a measure table that still need to be redacted.
+
+    Returns:
+        An empty list if the table is exactly as redact_measures.py last wrote
+        it, a list of dates if it is exactly as generate_measures.py last
+        wrote it, and None if its provenance is unknown (so every date must be
+        treated as unredacted).  A table that redaction left unchanged matches
+        both, and counts as redacted.
+    """
+    generated = generate_manifest["measures"].get(measure_id, {})
+    redacted = redact_manifest["measures"].get(measure_id, {})
+
+    if current_hash is not None and current_hash == redacted.get("hash"):
+        return []
+    if current_hash is not None and current_hash == generated.get("hash"):
+        return list(generated.get("pending_redaction", []))
+    return None
@@ -0,0 +1,39 @@
+import argparse
+from redact_measures import measures_dict, record_redacted_measures, redact_measure
+from generate_top_5_tables import generate_top_5_table
+from plot_measures import plot_all_measures
+from measure_manifest import get_codelists
+from codelist_store import load_codelist
+from profiling import write_profile
+from utilities import add_jobs_argument
+
+
+def run_pipeline(jobs=1):
+    """Runs the redact_measures, generate_top_5_table and plot_measures actions
+    in a single process.
+
+    Redacted measure tables are handed to the later stages in memory rather
+    than being read back from disk, but every stage still writes the same
+    outputs as when it is run as a separate action.  Plots are rendered with up
+    to `jobs` worker processes.
+    """
+    tables = {}
+    for key, value in measures_dict.items():
+        tables[key] = redact_measure(value.id, value.numerator, value.denominator)
+    record_redacted_measures(tables)
+
+    codelists = get_codelists()
+    for key, value in measures_dict.items():
+        if value.breakdown == 'event_code':
+            codelist = load_codelist(codelists[value.namespace]['codelist_path'])
+            generate_top_5_table(tables[key], codelist, value)
+
+    plot_all_measures(tables, jobs=jobs)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    add_jobs_argument(parser, "number of worker processes to render plots with")
+    args = parser.parse_args()
+    run_pipeline(jobs=args.jobs)
+    write_profile('run_pipeline')
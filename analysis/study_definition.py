@@ -1,12 +1,45 @@
 # Import functions
-import pandas as pd
 from cohortextractor import StudyDefinition, patients, codelist, Measure
-from codelists import codelist, ld_codes
-from config import start_date, end_date, codelist_path, demographics
+from codelists import codelist, ld_codes, batch_codelist
+from config import start_date, end_date, codelist_path, batch_codelists
+from measure_manifest import build_measure_specs, namespaced
+from codelist_store import load_codelist
 
 # Get codes from codelist to use in expectations
-codelist_df = pd.read_csv(codelist_path)
-codelist_expectation_codes = codelist_df["code"].unique()
+codelist_expectation_codes = load_codelist(codelist_path).codes.tolist()
+
+
+def get_batch_event_variables(namespace):
+    """Gets the event and event_code variables for a batch codelist.
+
+    They are defined as event and event_code are below, but with the batch
+    codelist's codes and namespaced names.
+    """
+    codes = batch_codelist[namespace]
+    expectation_codes = load_codelist(batch_codelists[namespace]["codelist_path"]).codes.tolist()
+    return {
+        namespaced("event", namespace): patients.with_these_clinical_events(
+            codelist=codes,
+            between=["index_date", "last_day_of_month(index_date)"],
+            returning="binary_flag",
+            return_expectations={"incidence": 0.5},
+        ),
+        namespaced("event_code", namespace): patients.with_these_clinical_events(
+            codelist=codes,
+            between=["index_date", "last_day_of_month(index_date)"],
+            returning="code",
+            return_expectations={
+                "category": {
+                    "ratios": {x: 1 / len(expectation_codes) for x in expectation_codes}
+                },
+            },
+        ),
+    }
+
+
+batch_event_variables = {}
+for namespace in batch_codelists:
+    batch_event_variables.update(get_batch_event_variables(namespace))
 
 # Specifiy study defeinition
 study = StudyDefinition(
@@ -202,45 +235,8 @@ study = StudyDefinition(
             },
         },
     ),
+    **batch_event_variables,
 )
 
-# Create default measures
-measures = [
-    # events broken down by code
-    Measure(
-        id="event_code_rate",
-        numerator="event",
-        denominator="population",
-        group_by=["event_code"],
-        small_number_suppression=False,
-    ),
-    # events broken down by practice
-    Measure(
-        id="practice_rate",
-        numerator="event",
-        denominator="population",
-        group_by=["practice"],
-        small_number_suppression=False,
-    ),
-    # population rate
-    Measure(
-        id="population_rate",
-        numerator="event",
-        denominator="population",
-        group_by="population",
-        small_number_suppression=False,
-    ),
-]
-
-
-# Add demographics measures
-
-for d in demographics:
-    m = Measure(
-        id=f"{d}_rate",
-        numerator="event",
-        denominator="population",
-        group_by=[d],
-        small_number_suppression=False,
-    )
-    measures.append(m)
+# Create measures from the specs shared with the analysis scripts
+measures = [Measure(**spec.to_measure_kwargs()) for spec in build_measure_specs()]
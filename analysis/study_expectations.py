@@ -0,0 +1,207 @@
+"""Reads the variables and expectations of a study definition without
+cohortextractor, by parsing its source with `ast`.
+
+The same information gives the dtypes that input files are read with.
+"""
+import ast
+import functools
+import numpy as np
+import pandas as pd
+from pathlib import Path
+import config
+from measure_manifest import namespaced
+from codelist_store import load_codelist
+
+BASE_DIR = Path(__file__).parents[1]
+ANALYSIS_DIR = BASE_DIR / "analysis"
+
+# The study definitions whose columns appear in the (joined) monthly input files
+INPUT_STUDY_DEFINITIONS = ["study_definition.py", "study_definition_ethnicity.py"]
+
+# cohortextractor functions that return a binary flag unless told otherwise
+BINARY_FUNCTIONS = {
+    "registered_as_of",
+    "died_from_any_cause",
+    "with_these_clinical_events",
+    "satisfying",
+    "all",
+}
+
+
+class StudyVariable:
+    """A variable in a study definition, with the parts needed to fake it."""
+
+    def __init__(self, name, function, returning, expectations, default_category):
+        self.name = name
+        self.function = function
+        self.returning = returning
+        self.expectations = expectations
+        self.default_category = default_category
+
+
+def _evaluate(node, namespace):
+    """Evaluates an expression node from a study definition."""
+    expression = ast.Expression(body=node)
+    return eval(compile(expression, "<study definition>", "eval"), namespace)
+
+
+def _get_namespace(tree):
+    """Builds a namespace for evaluating expectations in a study definition.
+
+    It holds the values in config, and any module-level assignments in the
+    study definition that can be evaluated from them (such as the codes used
+    for event_code's expectations).
+    """
+    namespace = {"pd": pd, "np": np, "len": len, "load_codelist": load_codelist}
+    namespace.update(
+        {k: v for k, v in vars(config).items() if not k.startswith("__")}
+    )
+    namespace["codelist_path"] = BASE_DIR / config.codelist_path
+    for statement in tree.body:
+        if isinstance(statement, ast.Assign):
+            try:
+                value = _evaluate(statement.value, namespace)
+            except Exception:
+                continue
+            for target in statement.targets:
+                if isinstance(target, ast.Name):
+                    namespace[target.id] = value
+    return namespace
+
+
+def _find_study_definition(tree):
+    """Finds the StudyDefinition(...) call in a study definition module."""
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Name)
+            and node.func.id == "StudyDefinition"
+        ):
+            return node
+    raise ValueError("No StudyDefinition found")
+
+
+def _get_default_category(call, namespace):
+    """Gets the category a categorised variable takes when no rule matches."""
+    categories = None
+    if call.func.attr == "categorised_as" and call.args:
+        categories = _evaluate(call.args[0], namespace)
+    for keyword in call.keywords:
+        if keyword.arg == "categorised_as":
+            categories = _evaluate(keyword.value, namespace)
+    if categories is None:
+        return None
+    for category, rule in categories.items():
+        if rule == "DEFAULT":
+            return category
+    return None
+
+
+def _get_batch_event_variables(variables):
+    """Gets the event and event_code variables of each batch codelist.
+
+    These are copies of event and event_code, with namespaced names and with
+    event_code's expectations taken from the batch codelist's codes, as in
+    study_definition.get_batch_event_variables.
+    """
+    by_name = {variable.name: variable for variable in variables}
+    batch_variables = []
+    for batch_namespace, batch in config.batch_codelists.items():
+        codes = load_codelist(batch["codelist_path"]).codes.tolist()
+        for name in ["event", "event_code"]:
+            variable = by_name[name]
+            expectations = dict(variable.expectations)
+            if name == "event_code":
+                expectations["category"] = {"ratios": {x: 1 / len(codes) for x in codes}}
+            batch_variables.append(
+                StudyVariable(
+                    name=namespaced(name, batch_namespace),
+                    function=variable.function,
+                    returning=variable.returning,
+                    expectations=expectations,
+                    default_category=variable.default_category,
+                )
+            )
+    return batch_variables
+
+
+def load_study_definition(path):
+    """Reads the default expectations, index date and variables of a study definition.
+
+    Only the top-level variables are returned (and not `population`), as these
+    are the columns cohortextractor writes.  The event variables of any batch
+    codelists are included.
+
+    Returns:
+        A tuple of (default expectations, index date, list of StudyVariable).
+    """
+    tree = ast.parse(Path(path).read_text())
+    namespace = _get_namespace(tree)
+    study = _find_study_definition(tree)
+
+    default_expectations = {}
+    index_date = None
+    variables = []
+    for keyword in study.keywords:
+        if keyword.arg == "default_expectations":
+            default_expectations = _evaluate(keyword.value, namespace)
+        elif keyword.arg == "index_date":
+            index_date = _evaluate(keyword.value, namespace)
+        elif keyword.arg is None:
+            # **batch_event_variables
+            variables += _get_batch_event_variables(variables)
+        elif keyword.arg != "population" and isinstance(keyword.value, ast.Call):
+            call = keyword.value
+            kwargs = {k.arg: k.value for k in call.keywords}
+            variables.append(
+                StudyVariable(
+                    name=keyword.arg,
+                    function=call.func.attr,
+                    returning=_evaluate(kwargs["returning"], namespace)
+                    if "returning" in kwargs
+                    else None,
+                    expectations=_evaluate(kwargs["return_expectations"], namespace)
+                    if "return_expectations" in kwargs
+                    else {},
+                    default_category=_get_default_category(call, namespace),
+                )
+            )
+    return default_expectations, index_date, variables
+
+
+def get_variable_dtype(variable):
+    """Gets a compact dtype for a study variable's column, or None for dates.
+
+    Integers are nullable, as cohortextractor leaves them blank for patients
+    without a value.
+    """
+    if "category" in variable.expectations:
+        return "category"
+    if "int" in variable.expectations:
+        distribution = variable.expectations["int"].get("distribution")
+        return "Int16" if distribution == "population_ages" else "Int32"
+    if variable.returning == "code":
+        return "category"
+    if variable.returning and "date" in variable.returning:
+        return None
+    if variable.returning in (None, "binary_flag") and variable.function in BINARY_FUNCTIONS:
+        return "int8"
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_input_dtypes():
+    """Gets the dtypes of the columns in the monthly input files.
+
+    Returns:
+        A dict of dtypes keyed by column name.  Columns without a compact dtype,
+        such as dates, are left out.
+    """
+    dtypes = {"patient_id": "int64"}
+    for name in INPUT_STUDY_DEFINITIONS:
+        _, _, variables = load_study_definition(ANALYSIS_DIR / name)
+        for variable in variables:
+            dtype = get_variable_dtype(variable)
+            if dtype is not None:
+                dtypes[variable.name] = dtype
+    return dtypes
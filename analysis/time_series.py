@@ -0,0 +1,212 @@
+"""Computes time-series statistics for every group in each redacted measure.
+
+Each measure table is pivoted into a dense group x month array of its rates,
+with NaN for months a group has no row in or whose rate was redacted, and
+every statistic is computed for all groups at once along the month axis:
+
+    rolling_mean        mean of the last ROLLING_WINDOW months
+    mom_change          change on the month before
+    yoy_change          change on the same month a year before
+    *_percent_change    the change as a percentage of the earlier rate
+
+Missing months are skipped by the rolling mean, and give a missing change.
+Rates are also compared between config.baseline_period and
+config.current_period.  The statistics are written, for each measure, to
+time_series_<id>.csv and baseline_comparison_<id>.csv.
+"""
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import NamedTuple
+from config import baseline_period, current_period
+from measure_manifest import get_measure_specs
+from measure_io import read_measure
+from output_writer import write_table
+from profiling import stage, write_profile
+
+BASE_DIR = Path(__file__).parents[1]
+OUTPUT_DIR = BASE_DIR / "output" / "joined"
+
+# Number of months averaged by the rolling mean
+ROLLING_WINDOW = 3
+
+
+class MeasureArray(NamedTuple):
+    """A column of a measure table as a dense group x month array.
+
+    groups holds the group columns' values for each row of values, sorted;
+    months is every month from the first to the last in the table.
+    """
+
+    groups: pd.DataFrame
+    months: pd.DatetimeIndex
+    values: np.ndarray
+
+    def to_frame(self, **columns):
+        """Unpivots group x month arrays into a long table, with one row for
+        each group and month, and a column for each keyword argument.
+
+        Like the rates in measure tables, the columns are float32.
+        """
+        n_groups, n_months = self.values.shape
+        df = self.groups.iloc[np.repeat(np.arange(n_groups), n_months)].reset_index(drop=True)
+        df["date"] = np.tile(self.months, n_groups)
+        for name, values in columns.items():
+            df[name] = values.ravel().astype(np.float32)
+        return df
+
+
+def get_group_columns(measure):
+    """Gets the columns a measure is grouped by, leaving out the population
+    column that the whole-population measure is "grouped" by."""
+    return [column for column in measure.group_by if column != "population"]
+
+
+def pivot_measure(df, group_columns, column="value", date_column="date"):
+    """Pivots a column of a measure table into a MeasureArray.
+
+    Args:
+        df: A measure table, with at most one row for each group and month
+        group_columns: names of the columns defining the groups
+        column: Name of column to pivot
+        date_column: Name of column holding the first day of each month
+    """
+    dates = pd.DatetimeIndex(df[date_column])
+    month_numbers = dates.year.to_numpy() * 12 + dates.month.to_numpy() - 1
+    if len(df):
+        first = month_numbers.min()
+        months = pd.date_range(dates.min(), periods=month_numbers.max() - first + 1, freq="MS")
+    else:
+        first = 0
+        months = pd.DatetimeIndex([])
+
+    if group_columns:
+        codes, uniques = zip(
+            *(pd.factorize(df[c], sort=True, use_na_sentinel=False) for c in group_columns)
+        )
+        shape = tuple(len(u) for u in uniques)
+        keys, group_index = np.unique(np.ravel_multi_index(codes, shape), return_inverse=True)
+        groups = pd.DataFrame(
+            {
+                c: pd.Series(u).take(positions).reset_index(drop=True)
+                for c, u, positions in zip(group_columns, uniques, np.unravel_index(keys, shape))
+            }
+        )
+    else:
+        group_index = np.zeros(len(df), dtype=int)
+        groups = pd.DataFrame(index=range(1 if len(df) else 0))
+
+    values = np.full((len(groups), len(months)), np.nan)
+    values[group_index, month_numbers - first] = df[column].to_numpy(dtype=float, na_value=np.nan)
+    return MeasureArray(groups, months, values)
+
+
+def rolling_mean(values, window=ROLLING_WINDOW):
+    """Mean of each group's values over the last `window` months.
+
+    Missing values are left out of the mean.  The mean is NaN for the first
+    window - 1 months, and where every month in the window is missing.
+    """
+    present = ~np.isnan(values)
+    zeros = np.zeros((values.shape[0], 1))
+    sums = np.hstack([zeros, np.cumsum(np.where(present, values, 0), axis=1)])
+    counts = np.hstack([zeros, np.cumsum(present, axis=1)])
+
+    result = np.full(values.shape, np.nan)
+    if values.shape[1] >= window:
+        window_sums = sums[:, window:] - sums[:, :-window]
+        window_counts = counts[:, window:] - counts[:, :-window]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result[:, window - 1 :] = np.where(window_counts > 0, window_sums / window_counts, np.nan)
+    return result
+
+
+def change(values, lag, relative=False):
+    """Change in each group's values on `lag` months before.
+
+    With relative=True the change is a percentage of the earlier value, and
+    NaN where that is 0.  The change is NaN for the first `lag` months, and
+    where either value is missing.
+    """
+    result = np.full(values.shape, np.nan)
+    if values.shape[1] > lag:
+        current, previous = values[:, lag:], values[:, :-lag]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if relative:
+                result[:, lag:] = np.where(previous != 0, (current - previous) / previous * 100, np.nan)
+            else:
+                result[:, lag:] = current - previous
+    return result
+
+
+def period_mean(values, months, period):
+    """Mean of each group's values over the months of an inclusive
+    (start, end) period, ignoring missing values."""
+    start, end = pd.to_datetime(period[0]), pd.to_datetime(period[1])
+    in_period = (months >= start) & (months <= end)
+    selected = values[:, in_period]
+    present = ~np.isnan(selected)
+    counts = present.sum(axis=1)
+    sums = np.where(present, selected, 0).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def compute_time_series(array, window=ROLLING_WINDOW):
+    """Computes the rolling mean and monthly and yearly changes of a MeasureArray.
+
+    Returns:
+        A long table with the group columns, date, value and a column for
+        each statistic.
+    """
+    values = array.values
+    return array.to_frame(
+        value=values,
+        rolling_mean=rolling_mean(values, window),
+        mom_change=change(values, 1),
+        mom_percent_change=change(values, 1, relative=True),
+        yoy_change=change(values, 12),
+        yoy_percent_change=change(values, 12, relative=True),
+    )
+
+
+def compare_periods(array, baseline=baseline_period, current=current_period):
+    """Compares each group's mean value between a baseline and a current period.
+
+    Returns:
+        A table with the group columns, the baseline and current means, and
+        the change between them, absolute and as a percentage of the baseline,
+        as float32.
+    """
+    baseline_values = period_mean(array.values, array.months, baseline)
+    current_values = period_mean(array.values, array.months, current)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        percent_change = np.where(
+            baseline_values != 0,
+            (current_values - baseline_values) / baseline_values * 100,
+            np.nan,
+        )
+    return array.groups.assign(
+        baseline=baseline_values.astype(np.float32),
+        current=current_values.astype(np.float32),
+        change=(current_values - baseline_values).astype(np.float32),
+        percent_change=percent_change.astype(np.float32),
+    )
+
+
+def write_time_series(measure, df, directory=None):
+    """Writes the time-series statistics and period comparison for a measure."""
+    directory = Path(directory) if directory is not None else OUTPUT_DIR
+    array = pivot_measure(df, get_group_columns(measure))
+    write_table(compute_time_series(array), directory / f"time_series_{measure.id}.csv")
+    write_table(compare_periods(array), directory / f"baseline_comparison_{measure.id}.csv")
+
+
+if __name__ == "__main__":
+    for measure in get_measure_specs():
+        with stage("read_measure", measure=measure.id) as record:
+            df = read_measure(measure.id)
+            record["rows"] = len(df)
+        with stage("time_series", measure=measure.id, rows=len(df)):
+            write_time_series(measure, df)
+    write_profile("time_series")
@@ -1,8 +1,14 @@
+import argparse
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import re
+import json
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from profiling import collect, extend, profiled
+from study_expectations import get_input_dtypes
+from codelist_store import CompiledCodelist
+from practice_matrix import PracticeMatrix
 
 BASE_DIR = Path(__file__).parents[1]
 OUTPUT_DIR = BASE_DIR / "output" / "joined"
@@ -14,6 +20,58 @@ def match_input_files(file: str) -> bool:
     return True if re.match(pattern, file) else False
 
 
+def get_date_input_file(file: str) -> str:
+    """Gets the date in format YYYY-MM-DD from input file name string"""
+    # check format
+    if not match_input_files(file):
+        raise ValueError(f"Not a valid input file: {file}")
+
+    date = re.search(r"input_(.*)\.csv.gz", file)
+    return date.group(1)
+
+
+def read_input_files(
+    columns=None, directory=None, chunksize=500_000, dtype=None, dates=None
+):
+    """Streams the monthly cohort extractor input files in chunks.
+
+    Files are visited in date order and each one is read in chunks, so that
+    aggregations over the whole study period run in constant memory.
+
+    Args:
+        columns: columns to read; all columns are read if None
+        directory: directory containing the input files, defaults to OUTPUT_DIR
+        chunksize: maximum number of rows in each chunk
+        dtype: mapping of column name to dtype, defaults to the dtypes declared
+            by the study definitions (see get_input_dtypes)
+        dates: optional collection of YYYY-MM-DD dates; only these months are read
+
+    Yields:
+        (date, chunk) tuples, where date is the file's index date as a Timestamp
+    """
+    directory = Path(directory) if directory is not None else OUTPUT_DIR
+    dtype = get_input_dtypes() if dtype is None else dtype
+
+    files = sorted(
+        (get_date_input_file(file.name), file)
+        for file in directory.iterdir()
+        if match_input_files(file.name)
+        and (dates is None or get_date_input_file(file.name) in dates)
+    )
+
+    for date, file in files:
+        usecols = None if columns is None else list(columns)
+        column_dtypes = {
+            k: v for k, v in dtype.items() if usecols is None or k in usecols
+        }
+        with pd.read_csv(
+            file, usecols=usecols, dtype=column_dtypes, chunksize=chunksize
+        ) as reader:
+            for chunk in reader:
+                yield pd.Timestamp(date), chunk
+
+
+@profiled
 def redact_small_numbers(df, n, numerator, denominator, rate_column, date_column):
     """
     Takes counts df as input and suppresses low numbers.  Sequentially redacts
@@ -23,40 +81,77 @@ def redact_small_numbers(df, n, numerator, denominator, rate_column, date_column
     n: threshold for low number suppression
     numerator: numerator column to be redacted
     denominator: denominator column to be redacted
-    """
-
-    def suppress_column(column):
-        suppressed_count = column[column <= n].sum()
+    rate_column: rate column to be redacted where either count is redacted
+    date_column: column that defines the groups redaction is applied within
 
-        # if 0 dont need to suppress anything
-        if suppressed_count == 0:
-            pass
+    Redaction is computed for every date in a single vectorised pass.  Rows are
+    returned grouped by date, in order of first appearance, and rows with a
+    missing date are dropped.
+    """
+    date_codes = pd.factorize(df[date_column])[0]
+    order = np.argsort(date_codes, kind="stable")
+    order = order[date_codes[order] >= 0]
 
-        else:
-            column[column <= n] = np.nan
+    df = df.iloc[order].copy()
+    date_codes = date_codes[order]
 
-            while suppressed_count <= n:
-                suppressed_count += column.min()
+    # Redacted values are masked rather than written as NaN, so that nullable
+    # and float32 columns keep their dtype
+    for column in [numerator, denominator]:
+        values = df[column].to_numpy(dtype=float, na_value=np.nan)
+        redact = _small_number_mask(values, date_codes, n)
+        if redact.any():
+            df[column] = df[column].where(~redact)
 
-                column[column.idxmin()] = np.nan
-        return column
+    redact_rate = (df[numerator].isna() | df[denominator].isna()).to_numpy()
+    if redact_rate.any():
+        df[rate_column] = df[rate_column].where(~redact_rate)
 
-    df_list = []
+    return df
 
-    dates = df[date_column].unique()
 
-    for d in dates:
-        df_subset = df.loc[df[date_column] == d, :]
+def _small_number_mask(values, group_codes, n):
+    """Returns a boolean mask of the values to redact within each group.
 
-        for column in [numerator, denominator]:
-            df_subset[column] = suppress_column(df_subset[column])
+    Within a group, every value <= n is redacted.  If those values sum to more
+    than zero, the smallest remaining values are then redacted (ties broken by
+    position) until the total redacted count exceeds n.
 
-        df_subset.loc[
-            (df_subset[numerator].isna()) | (df_subset[denominator].isna()), rate_column
-        ] = np.nan
-        df_list.append(df_subset)
+    Args:
+        values: float array of counts
+        group_codes: non-negative integer group code for each value
+        n: threshold for low number suppression
+    """
+    n_groups = group_codes.max() + 1 if len(group_codes) else 0
+    small = values <= n
+    small_total = np.bincount(
+        group_codes, weights=np.where(small, values, 0), minlength=n_groups
+    )
+    active = small_total != 0
+
+    redact = small & active[group_codes]
+
+    # Remaining candidates, ordered by group, then value, then position
+    candidates = np.flatnonzero(~small & ~np.isnan(values) & active[group_codes])
+    candidates = candidates[
+        np.lexsort((candidates, values[candidates], group_codes[candidates]))
+    ]
+    candidate_groups = group_codes[candidates]
+    candidate_values = values[candidates]
+
+    # Running total of the candidates ranked before each one in its group
+    running_total = np.cumsum(candidate_values) - candidate_values
+    is_group_start = np.ones(len(candidates), dtype=bool)
+    is_group_start[1:] = candidate_groups[1:] != candidate_groups[:-1]
+    group_start = np.maximum.accumulate(
+        np.where(is_group_start, np.arange(len(candidates)), 0)
+    )
+    redacted_before = (
+        small_total[candidate_groups] + running_total - running_total[group_start]
+    )
 
-    return pd.concat(df_list, axis=0)
+    redact[candidates[redacted_before <= n]] = True
+    return redact
 
 
 def convert_binary(df, binary_column, positive, negative):
@@ -89,105 +184,393 @@ def drop_missing_demographics(df, demographic):
     return df.loc[df[demographic].notnull(), :]
 
 
-def drop_irrelevant_practices(df, practice_col):
+@profiled
+def build_practice_activity_index(df, practice_col="practice", date_col="date"):
+    """Builds an index of which practices have any events in which months.
+
+    The index is built with a single groupby over the practice measure table,
+    and can be passed to drop_irrelevant_practices and get_number_practices so
+    that they don't rescan the table.
+    Args:
+        df: A practice measure table.
+        practice_col: column name of practice column
+        date_col: column name of date column
+    Returns:
+        A boolean table with one row per practice and one column per month,
+        which is True where the practice has a non-zero value in that month.
+    """
+    if isinstance(df, PracticeMatrix):
+        return pd.DataFrame(
+            _is_active(df),
+            index=pd.Index(df.practices, name=practice_col),
+            columns=pd.Index(df.months, name=date_col),
+        )
+    return (
+        df.groupby([practice_col, date_col])
+        .value.any()
+        .unstack(date_col, fill_value=False)
+        .astype(bool)
+    )
+
+
+def _is_active(matrix):
+    """Gets where each practice in a PracticeMatrix has a non-zero value."""
+    return ~np.isnan(matrix.value) & (matrix.value != 0)
+
+
+@profiled
+def drop_irrelevant_practices(df, practice_col, activity_index=None):
     """Drops irrelevant practices from the given measure table.
     An irrelevant practice has zero events during the study period.
     Args:
         df: A measure table.
         practice_col: column name of practice column
+        activity_index: optional index from build_practice_activity_index
     Returns:
         A copy of the given measure table with irrelevant practices dropped.
+        A PracticeMatrix is returned as a PracticeMatrix.
     """
-    is_relevant = df.groupby(practice_col).value.any()
+    if isinstance(df, PracticeMatrix):
+        if activity_index is None:
+            return df.select(_is_active(df).any(axis=1))
+        is_relevant = activity_index.any(axis=1)
+        return df.select(np.isin(df.practices, is_relevant[is_relevant].index))
+
+    if activity_index is None:
+        is_relevant = df.groupby(practice_col).value.any()
+    else:
+        is_relevant = activity_index.any(axis=1)
     return df[df[practice_col].isin(is_relevant[is_relevant == True].index)]
 
 
+def _compile_codelist(code_df, code_column, term_column):
+    """Compiles a codelist table for looking up descriptions.
+
+    A CompiledCodelist (see load_codelist) is returned as it is.
+    """
+    if isinstance(code_df, CompiledCodelist):
+        return code_df
+    return CompiledCodelist.from_frame(code_df[[code_column, term_column]], code_column)
+
+
+def _top_k_code_table(event_counts, codelist, code_column, term_column, k):
+    """Creates a top `k` code table from a series of event counts indexed by code.
+
+    The top `k` codes are selected with nlargest rather than a full sort, and
+    only their descriptions are looked up in the CompiledCodelist.
+    """
+    total_events = event_counts.sum()
+    top_k = event_counts.nlargest(k)
+
+    codes = top_k.index.to_numpy().astype(int)
+    table = pd.DataFrame(
+        {
+            code_column: codes,
+            "Description": codelist.lookup(codes, term_column),
+            "Events": top_k.to_numpy(),
+            "Proportion of codes (%)": np.round(
+                (top_k.to_numpy() / total_events) * 100, 2
+            ),
+        }
+    )
+
+    # check that codes not in the top k rows have >5 events
+    events_outside_top_k = total_events - top_k.sum()
+    return table, 0 < events_outside_top_k <= 5
+
+
+@profiled
 def create_top_5_code_table(df, code_df, code_column, term_column, nrows=5):
     """Creates a table of the top 5 codes recorded with the number of events and % makeup of each code.
 
     Args:
         df: A measure table.
-        code_df: A codelist table.
+        code_df: A codelist table, or a CompiledCodelist.
         code_column: The name of the code column in the codelist table.
         term_column: The name of the term column in the codelist table.
-        measure: The measure ID.
         nrows: The number of rows to display.
     Returns:
         A table of the top `nrows` codes.
     """
-    event_counts = (
-        df.groupby("event_code")["event"]
-        .sum()  # We can't use .count() because the measure column contains zeros.
-        .rename_axis(code_column)
-        .rename("Events")
-        .reset_index()
-        .sort_values("Events", ascending=False)
-    )
-
-    # calculate % makeup of each code
-    total_events = event_counts["Events"].sum()
-    event_counts["Proportion of codes (%)"] = round(
-        (event_counts["Events"] / total_events) * 100, 2
+    event_counts = df.groupby("event_code", observed=True)["event"].sum()  # We can't use .count() because the measure column contains zeros.
+    codelist = _compile_codelist(code_df, code_column, term_column)
+    table, is_disclosive = _top_k_code_table(
+        event_counts, codelist, code_column, term_column, nrows
     )
 
-    # Gets the human-friendly description of the code for the given row
-    # e.g. "Systolic blood pressure".
-    code_df = code_df.set_index(code_column).rename(
-        columns={term_column: "Description"}
-    )
-    event_counts = event_counts.set_index(code_column).join(code_df).reset_index()
+    if is_disclosive:
+        # drop events and percent columns
+        table = table.loc[:, [code_column, "Description"]]
 
-    # Cast the code to an integer.
-    event_counts[code_column] = event_counts[code_column].astype(int)
+    return table
 
-    # check that codes not in the top 5 rows have >5 events
-    outside_top_5_percent = 1 - ((event_counts.head(5)["Events"].sum()) / total_events)
 
-    if 0 < (outside_top_5_percent * total_events) <= 5:
-        # drop percent column
-        event_counts = event_counts.loc[:, ["code", "Description"]]
+@profiled
+def create_top_k_code_tables(
+    df, code_df, code_column, term_column, k=5, date_column="date"
+):
+    """Creates tables of the top `k` codes across the study period and in each month.
 
-    else:
-        # give more logical column ordering
-        event_counts = event_counts.loc[
-            :, ["code", "Description", "Events", "Proportion of codes (%)"]
-        ]
+    Both tables come from a single groupby pass over the measure table.  In the
+    monthly table, Events and Proportion of codes (%) are redacted for any month
+    where the codes outside the top `k` have between 1 and 5 events.
 
-    # return top n rows
-    return event_counts.head(5)
+    Args:
+        df: A measure table.
+        code_df: A codelist table, or a CompiledCodelist.
+        code_column: The name of the code column in the codelist table.
+        term_column: The name of the term column in the codelist table.
+        k: The number of codes to include (per month, in the monthly table).
+        date_column: The name of the date column in the measure table.
+    Returns:
+        A tuple of (top k code table, monthly top k code table).
+    """
+    monthly_counts = df.groupby([date_column, "event_code"], observed=True)["event"].sum()
 
+    # Compiled once, and shared by the overall and every monthly table
+    codelist = _compile_codelist(code_df, code_column, term_column)
 
-def get_number_practices(df):
+    overall_counts = monthly_counts.groupby(level="event_code").sum()
+    top_k_table, is_disclosive = _top_k_code_table(
+        overall_counts, codelist, code_column, term_column, k
+    )
+    if is_disclosive:
+        top_k_table = top_k_table.loc[:, [code_column, "Description"]]
+
+    monthly_tables = []
+    for date, event_counts in monthly_counts.groupby(level=date_column):
+        table, is_disclosive = _top_k_code_table(
+            event_counts.droplevel(date_column), codelist, code_column, term_column, k
+        )
+        if is_disclosive:
+            table[["Events", "Proportion of codes (%)"]] = np.nan
+        table.insert(0, date_column, date)
+        monthly_tables.append(table)
+
+    if not monthly_tables:
+        # Laid out as the monthly tables are, with the date first
+        empty = top_k_table.iloc[0:0].copy()
+        empty.insert(0, date_column, df[date_column].iloc[0:0].to_numpy())
+        return top_k_table, empty
+
+    monthly_top_k_table = pd.concat(monthly_tables, ignore_index=True)
+    return top_k_table, monthly_top_k_table
+
+
+def get_number_practices(df, activity_index=None):
     """Gets the number of practices in the given measure table.
     Args:
         df: A measure table.
+        activity_index: optional index from build_practice_activity_index
     """
+    if activity_index is not None:
+        return len(activity_index)
+    if isinstance(df, PracticeMatrix):
+        return len(df)
     return len(df.practice.unique())
 
 
-def get_percentage_practices(measure_table):
-    """Gets the percentage of practices in the given measure table.
+PRACTICE_UNIVERSE_CACHE = ".practice_universe.json"
+
+_practice_universe_memo = {}
+
+
+def _practice_count_files(directory):
+    """Gets the input practice count files in the given directory, sorted by name."""
+    return sorted(
+        file
+        for file in directory.iterdir()
+        if file.name.startswith("input_practice_count")
+    )
+
+
+@profiled
+def get_practice_universe(directory=None):
+    """Gets the unique practices across all input practice count files.
+
+    Only the practice column is read, a chunk at a time.  The result is cached
+    in memory and in a JSON file alongside the inputs; both are keyed on the
+    name, size and modification time of every practice count file, so adding
+    or changing a file invalidates them.
     Args:
-        measure_table: A measure table.
+        directory: directory containing the files, defaults to OUTPUT_DIR
+    Returns:
+        An array of unique practice ids.
     """
+    directory = Path(directory) if directory is not None else OUTPUT_DIR
+    files = _practice_count_files(directory)
+    fingerprint = [
+        [file.name, file.stat().st_size, file.stat().st_mtime_ns] for file in files
+    ]
+
+    key = (str(directory), json.dumps(fingerprint))
+    if key in _practice_universe_memo:
+        return _practice_universe_memo[key]
+
+    cache_path = directory / PRACTICE_UNIVERSE_CACHE
+    practices = None
+    if cache_path.exists():
+        cached = json.loads(cache_path.read_text())
+        if cached["files"] == fingerprint:
+            practices = np.array(cached["practices"], dtype=float)
+
+    if practices is None:
+        practices = np.array([], dtype=float)
+        for file in files:
+            with pd.read_csv(
+                file, usecols=["practice"], dtype={"practice": float}, chunksize=500_000
+            ) as reader:
+                for chunk in reader:
+                    practices = np.unique(
+                        np.concatenate([practices, chunk["practice"].unique()])
+                    )
+        try:
+            cache_path.write_text(
+                json.dumps({"files": fingerprint, "practices": practices.tolist()})
+            )
+        except OSError:
+            pass
 
-    # Read in all input practice count files and get num unique
-    practice_df_list = []
+    _practice_universe_memo[key] = practices
+    return practices
 
-    for file in OUTPUT_DIR.iterdir():
-        if file.name.startswith("input_practice_count"):
-            df = pd.read_csv(OUTPUT_DIR / file.name)
-            practice_df_list.append(df)
 
-    total_practices_df = pd.concat(practice_df_list, axis=0)
-    num_practices_total = get_number_practices(total_practices_df)
+@profiled
+def get_percentage_practices(measure_table, activity_index=None, directory=None):
+    """Gets the percentage of practices in the given measure table.
+    Args:
+        measure_table: A measure table.
+        activity_index: optional index from build_practice_activity_index
+        directory: directory containing the input practice count files,
+            defaults to OUTPUT_DIR
+    """
+
+    # Get num unique practices across all input practice count files
+    num_practices_total = len(get_practice_universe(directory))
 
     # Get number of practices in measure
-    num_practices_in_study = get_number_practices(measure_table)
+    num_practices_in_study = get_number_practices(measure_table, activity_index)
 
     return np.round((num_practices_in_study / num_practices_total) * 100, 2)
 
 
+DECILES = list(range(10, 100, 10))
+
+
+@profiled
+def compute_deciles(
+    df,
+    column="value",
+    date_column="date",
+    percentiles=DECILES,
+    activity_index=None,
+    practice_col="practice",
+):
+    """Computes percentiles of a column across rows (e.g. practices) for each date.
+
+    Percentiles are interpolated linearly between values, as with
+    DataFrame.quantile, and missing values are ignored.  Every date is handled
+    in a single pass over the table sorted by date and value.
+
+    Args:
+        df: A measure table, or a PracticeMatrix, whose months are sorted in
+            place of the table
+        column: Name of column to compute percentiles of
+        date_column: Name of column defining the periods
+        percentiles: integer percentiles to compute, defaults to the deciles
+        activity_index: optional index from build_practice_activity_index; if
+            given, only the relevant practices in it are included
+        practice_col: column name of practice column, used with activity_index
+    Returns:
+        A table with date_column, percentile and column columns, sorted by date
+        and percentile.  Dates with no values are left out.
+    """
+    if activity_index is not None:
+        df = drop_irrelevant_practices(df, practice_col, activity_index)
+
+    if isinstance(df, PracticeMatrix):
+        # Each month's values sorted, with missing values last
+        values = np.sort(df[column], axis=0).T.ravel()
+        counts = (~np.isnan(df[column])).sum(axis=0)
+        starts = np.arange(len(df.months)) * len(df)
+        has_values = counts > 0
+        uniques, counts, starts = df.months[has_values], counts[has_values], starts[has_values]
+    else:
+        values = df[column].to_numpy(dtype=float, na_value=np.nan)
+        dates = df[date_column].to_numpy()
+        present = ~np.isnan(values) & ~pd.isna(dates)
+        values, dates = values[present], dates[present]
+
+        date_codes, uniques = pd.factorize(dates, sort=True)
+        order = np.lexsort((values, date_codes))
+        values = values[order]
+        counts = np.bincount(date_codes, minlength=len(uniques))
+        starts = np.cumsum(counts) - counts
+
+    # Fractional position of each percentile within each date's sorted values
+    fractions = np.asarray(percentiles, dtype=float) / 100
+    positions = (counts[:, None] - 1) * fractions[None, :]
+    lower = np.floor(positions)
+    upper = np.minimum(lower + 1, counts[:, None] - 1)
+    lower_values = values[(starts[:, None] + lower).astype(int)]
+    upper_values = values[(starts[:, None] + upper).astype(int)]
+    result = lower_values + (upper_values - lower_values) * (positions - lower)
+
+    return pd.DataFrame(
+        {
+            date_column: np.repeat(uniques, len(fractions)),
+            "percentile": np.tile(np.asarray(percentiles), len(uniques)),
+            column: result.ravel(),
+        }
+    )
+
+
+def plot_deciles(deciles, filename, title="", y_label="", column="value", date_column="date"):
+    """Draws a decile chart from a table made by compute_deciles.
+
+    The median is drawn as a solid line and the other percentiles as dashed
+    lines, as in ebmdatalab's deciles_chart.
+
+    Args:
+        deciles: A table from compute_deciles
+        filename: Name of the file to write to OUTPUT_DIR
+        title: Plot title string
+        y_label: String indicating y axis text
+        column: Name of the column holding the percentile values
+        date_column: Name of column defining the periods
+    """
+    from matplotlib.dates import DateFormatter
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.subplots()
+    labels_seen = set()
+    for percentile, data in deciles.groupby("percentile", sort=True):
+        style, label = ("b-", "median") if percentile == 50 else ("b--", "decile")
+        ax.plot(
+            data[date_column],
+            data[column],
+            style,
+            linewidth=1.5 if percentile == 50 else 1,
+            label="_nolegend_" if label in labels_seen else label,
+        )
+        labels_seen.add(label)
+
+    ax.set_ylabel(y_label, size=15, alpha=0.6)
+    if title:
+        ax.set_title(title, size=18)
+    if len(deciles):
+        ax.set_ylim([0, deciles[column].max() * 1.05])
+        ax.set_xlim([deciles[date_column].min(), deciles[date_column].max()])
+    ax.grid(color=".9")
+    ax.tick_params(labelsize=12)
+    ax.xaxis.set_major_formatter(DateFormatter("%B %Y"))
+    ax.legend(bbox_to_anchor=(1.1, 0.8), loc="center left", fontsize=12, borderaxespad=0.0)
+    fig.autofmt_xdate()
+    fig.savefig(OUTPUT_DIR / filename, bbox_inches="tight")
+
+
+@profiled
 def plot_measures(
     df, filename, title, column_to_plot, category=False, y_label="Rate per 1000"
 ):
@@ -201,27 +584,109 @@ def plot_measures(
         category: Name of column indicating different categories
         y_label: String indicating y axis text
     """
-    plt.figure(figsize=(15, 8))
-    if category:
-        for unique_category in df[category].unique():
+    # Draw on an explicit Agg figure rather than the global pyplot state, so
+    # that plots can be rendered safely from worker processes.
+    from matplotlib.figure import Figure
 
-            df_subset = df[df[category] == unique_category]
-
-            plt.plot(df_subset["date"], df_subset[column_to_plot], marker="o")
+    fig = Figure(figsize=(15, 8))
+    ax = fig.subplots()
+    if category:
+        # One pass to split the table, keeping categories in order of appearance
+        groups = df.groupby(category, sort=False, observed=True)
+        labels = []
+        for unique_category, df_subset in groups:
+            ax.plot(df_subset["date"], df_subset[column_to_plot], marker="o")
+            labels.append(unique_category)
     else:
-        plt.plot(df["date"], df[column_to_plot], marker="o")
+        ax.plot(df["date"], df[column_to_plot], marker="o")
 
-    plt.ylabel(y_label)
-    plt.xlabel("Date")
-    plt.xticks(rotation="vertical")
-    plt.title(title)
+    ax.set_ylabel(y_label)
+    ax.set_xlabel("Date")
+    ax.tick_params(axis="x", labelrotation=90)
+    ax.set_title(title)
 
     if category:
-        plt.legend(df[category].unique(), bbox_to_anchor=(1.04, 1), loc="upper left")
+        ax.legend(labels, bbox_to_anchor=(1.04, 1), loc="upper left")
 
     else:
         pass
 
-    plt.tight_layout()
-    plt.savefig(OUTPUT_DIR / filename)
-    plt.clf()
+    fig.tight_layout()
+    fig.savefig(OUTPUT_DIR / filename)
+
+
+def _jobs(value):
+    """Parses a --jobs argument, which must be at least 1."""
+    jobs = int(value)
+    if jobs < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return jobs
+
+
+def add_jobs_argument(parser, help):
+    """Adds a --jobs option, the number of worker processes, to an argument parser."""
+    parser.add_argument("--jobs", type=_jobs, default=1, help=help)
+
+
+def _init_job_worker(initializer, initargs):
+    # Drop any profiling records inherited from the parent, which reports its own
+    collect()
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _run_job(fn, args):
+    """Runs a job in a worker process.
+
+    Returns a tuple of (result, profiling records made in the worker).
+    """
+    return fn(*args), collect()
+
+
+def run_jobs(fn, jobs_args, jobs=1, label="run", initializer=None, initargs=()):
+    """Calls fn once for each job, using up to `jobs` worker processes.
+
+    With jobs=1 the jobs are run in this process, one after another.  Worker
+    processes are started with initializer(*initargs), which is called in
+    this process too if jobs=1, and the profiling records made in them are
+    added to this process's.
+
+    If a job fails, the jobs not yet started are cancelled and a RuntimeError
+    naming the failed job is raised.  Jobs that had finished keep their
+    effects.
+
+    Args:
+        fn: function to call; with jobs > 1 it must be picklable, so defined
+            at the top level of a module
+        jobs_args: dict of tuples of arguments to fn, keyed by the name of
+            each job
+        jobs: number of worker processes
+        label: what a job does, for error messages, e.g. "redact measure"
+        initializer: optional function to call in each worker when it starts
+        initargs: arguments to initializer
+    Returns:
+        A dict of fn's results, keyed by the name of each job.
+    """
+    results = {}
+    if jobs == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for name, args in jobs_args.items():
+            try:
+                results[name] = fn(*args)
+            except Exception as e:
+                raise RuntimeError(f"Failed to {label} '{name}'") from e
+        return results
+
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=_init_job_worker, initargs=(initializer, initargs)
+    ) as executor:
+        futures = {name: executor.submit(_run_job, fn, args) for name, args in jobs_args.items()}
+        for name, future in futures.items():
+            try:
+                results[name], records = future.result()
+            except Exception as e:
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise RuntimeError(f"Failed to {label} '{name}'") from e
+            extend(records)
+    return results
@@ -0,0 +1,238 @@
+"""Benchmarks for the analysis utilities at realistic table sizes.
+
+Each benchmark records its best wall time over a few repeats and its peak
+traced memory, and is compared against the results in baseline.json.  Run
+from the repository root:
+
+    python benchmarks/benchmark_utilities.py
+    python benchmarks/benchmark_utilities.py --update-baseline
+
+A benchmark is reported as a regression if it is slower, or uses more memory,
+than `--tolerance` times its baseline (ignoring differences of less than
+MIN_DELTA, which are within noise for the fastest benchmarks).  Baselines are machine dependent, so
+update them when benchmarking on a new runner.
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).parents[1]
+sys.path.insert(0, str(BASE_DIR / "analysis"))
+
+import utilities  # noqa: E402
+from codelist_store import CompiledCodelist  # noqa: E402
+from practice_matrix import PracticeMatrix  # noqa: E402
+from config import demographics  # noqa: E402
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+N_PRACTICES = 8000
+N_MONTHS = 60
+N_CODES = 1000
+
+MIN_DELTA = {"time_s": 0.05, "peak_mib": 1.0}
+
+# Number of categories of each demographic, as defined in study_definition.py
+N_CATEGORIES = {
+    "sex": 2,
+    "age_band": 8,
+    "region": 8,
+    "imd": 6,
+    "ethnicity": 6,
+    "learning_disability": 2,
+    "care_home_status": 5,
+}
+
+
+def make_measure_table(group_column, groups, n_months, rng, mean_population):
+    """Makes a measure table with one row per group per month."""
+    dates = pd.date_range("2017-01-01", periods=n_months, freq="MS")
+    n_rows = len(groups) * n_months
+    population = rng.poisson(mean_population, n_rows)
+    event = rng.binomial(population, 0.05)
+    return pd.DataFrame(
+        {
+            group_column: np.tile(groups, n_months),
+            "event": event,
+            "population": population,
+            "value": event / np.maximum(population, 1),
+            "date": np.repeat(dates, len(groups)),
+        }
+    )
+
+
+def make_tables(scale):
+    """Makes the practice, event code and demographic measure tables."""
+    rng = np.random.default_rng(0)
+    n_practices = max(int(N_PRACTICES * scale), 10)
+    n_codes = max(int(N_CODES * scale), 10)
+
+    tables = {
+        "practice": make_measure_table(
+            "practice", np.arange(n_practices), N_MONTHS, rng, 100
+        ),
+        "event_code": make_measure_table(
+            "event_code", np.arange(n_codes), N_MONTHS, rng, 50
+        ),
+    }
+    for d in demographics:
+        categories = [f"{d}_{i}" for i in range(N_CATEGORIES.get(d, 5))]
+        tables[d] = make_measure_table(d, categories, N_MONTHS, rng, 100_000)
+
+    # Compiled once, as load_codelist does for the analysis scripts
+    codelist = CompiledCodelist.from_frame(
+        pd.DataFrame(
+            {"code": np.arange(n_codes), "term": [f"Code {i}" for i in range(n_codes)]}
+        )
+    )
+    return tables, codelist
+
+
+def get_benchmarks(tables, codelist, output_dir):
+    """Returns a dict of benchmark name to zero-argument callable."""
+
+    practice_matrix = PracticeMatrix.from_frame(tables["practice"])
+
+    def plot(d):
+        with patch.object(utilities, "OUTPUT_DIR", output_dir):
+            utilities.plot_measures(
+                tables[d], f"plot_{d}.png", d, "value", category=d, y_label="Proportion"
+            )
+
+    benchmarks = {
+        "redact_small_numbers[practice]": lambda: utilities.redact_small_numbers(
+            tables["practice"], 5, "event", "population", "value", "date"
+        ),
+        "redact_small_numbers[event_code]": lambda: utilities.redact_small_numbers(
+            tables["event_code"], 5, "event", "population", "value", "date"
+        ),
+        "create_top_5_code_table": lambda: utilities.create_top_5_code_table(
+            tables["event_code"], codelist, "code", "term"
+        ),
+        "drop_irrelevant_practices": lambda: utilities.drop_irrelevant_practices(
+            tables["practice"], "practice"
+        ),
+        "compute_deciles": lambda: utilities.compute_deciles(
+            tables["practice"], column="event"
+        ),
+        "PracticeMatrix.from_frame": lambda: PracticeMatrix.from_frame(
+            tables["practice"]
+        ),
+        "PracticeMatrix.to_frame": practice_matrix.to_frame,
+        "drop_irrelevant_practices[practice_matrix]": lambda: utilities.drop_irrelevant_practices(
+            practice_matrix, "practice"
+        ),
+        "compute_deciles[practice_matrix]": lambda: utilities.compute_deciles(
+            practice_matrix, column="event"
+        ),
+    }
+    for d in demographics:
+        benchmarks[f"redact_small_numbers[{d}]"] = (
+            lambda d=d: utilities.redact_small_numbers(
+                tables[d], 5, "event", "population", "value", "date"
+            )
+        )
+        benchmarks[f"plot_measures[{d}]"] = lambda d=d: plot(d)
+    return benchmarks
+
+
+def run_benchmark(func, repeats):
+    """Returns the best wall time (s) and the peak traced memory (MiB) of func."""
+    # Warm up, so that one-off costs such as matplotlib's font cache aren't timed
+    func()
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"time_s": round(min(times), 4), "peak_mib": round(peak / 2**20, 2)}
+
+
+def find_regressions(results, baseline, tolerance):
+    """Returns a message for each result that exceeds tolerance x its baseline."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric in ["time_s", "peak_mib"]:
+            limit = max(
+                baseline[name][metric] * tolerance,
+                baseline[name][metric] + MIN_DELTA[metric],
+            )
+            if result[metric] > limit:
+                regressions.append(
+                    f"{name}: {metric} {result[metric]} > {limit:.4g} "
+                    f"({tolerance}x baseline {baseline[name][metric]})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="multiplier for the number of practices and codes",
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="write the results to baseline.json instead of comparing",
+    )
+    args = parser.parse_args()
+
+    tables, codelist = make_tables(args.scale)
+    results = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        for name, func in get_benchmarks(tables, codelist, Path(output_dir)).items():
+            results[name] = run_benchmark(func, args.repeats)
+            print(
+                f"{name:45} {results[name]['time_s']:>9.4f} s "
+                f"{results[name]['peak_mib']:>9.2f} MiB"
+            )
+
+    if args.update_baseline:
+        BASELINE_PATH.write_text(
+            json.dumps(
+                {"scale": args.scale, "results": results}, indent=2, sort_keys=True
+            )
+            + "\n"
+        )
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+
+    if not BASELINE_PATH.exists():
+        print("No baseline to compare against; run with --update-baseline")
+        return 0
+
+    baseline = json.loads(BASELINE_PATH.read_text())
+    if baseline["scale"] != args.scale:
+        print(f"Baseline was recorded at scale {baseline['scale']}; not comparing")
+        return 0
+
+    regressions = find_regressions(results, baseline["results"], args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# The analysis scripts are run from the repository root as
+# `python analysis/<script>.py`, so they import their sibling modules (e.g.
+# `from config import demographics`) by name.  Mirror that here.
+sys.path.insert(0, str(Path(__file__).parents[1] / "analysis"))
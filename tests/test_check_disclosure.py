@@ -0,0 +1,66 @@
+import numpy as np
+import pandas
+from analysis import check_disclosure
+
+
+def test_check_table():
+    df = pandas.DataFrame(
+        {
+            "event": [0, 3, np.nan, 10],
+            "population": [10, 20, 30, 6],
+            "value": [0.0, 0.15, 0.1, np.nan],
+        }
+    )
+
+    obs = check_disclosure.check_table(df, ["event", "population"])
+
+    assert list(obs.itertuples(index=False, name=None)) == [
+        (1, "event", "small_count"),
+        (2, "value", "derived_value"),
+    ]
+
+
+def test_check_outputs(tmp_path):
+    pandas.DataFrame(
+        {"sex": ["F", "M"], "event": [6, np.nan], "population": [10, 4], "value": [0.6, np.nan], "date": ["2021-01-01"] * 2}
+    ).to_csv(tmp_path / "measure_sex_rate.csv")
+    pandas.DataFrame(
+        {"code": [1, 2], "Description": ["A", "B"], "Events": [10, 2], "Proportion of codes (%)": [83.3, 16.7]}
+    ).to_csv(tmp_path / "top_5_code_table.csv", index=False)
+    pandas.DataFrame(
+        {"date": ["2021-01-01"] * 2, "code": [1, 2], "Events": [np.nan, 7], "Proportion of codes (%)": [50.0, np.nan]}
+    ).to_csv(tmp_path / "top_5_code_table_monthly.csv", index=False)
+    pandas.DataFrame({"date": ["2021-01-01"], "percentile": [10], "event": [1.5]}).to_csv(
+        tmp_path / "decile_table.csv", index=False
+    )
+
+    pandas.DataFrame(
+        {
+            "date": ["2021-01-01", "2021-02-01"],
+            "value": [0.5, np.nan],
+            "rolling_mean": [np.nan, 0.5],
+            "mom_change": [np.nan, -0.1],
+        }
+    ).to_csv(tmp_path / "time_series_population_rate.csv", index=False)
+    pandas.DataFrame({"baseline": [0.5], "current": [0.4], "change": [-0.1]}).to_csv(
+        tmp_path / "baseline_comparison_population_rate.csv", index=False
+    )
+
+    assert [path.name for path in check_disclosure.get_released_files(tmp_path)] == [
+        "baseline_comparison_population_rate.csv",
+        "decile_table.csv",
+        "measure_sex_rate.csv",
+        "time_series_population_rate.csv",
+        "top_5_code_table.csv",
+        "top_5_code_table_monthly.csv",
+    ]
+
+    obs = check_disclosure.check_outputs(tmp_path, jobs=2)
+
+    assert list(obs.itertuples(index=False, name=None)) == [
+        ("decile_table.csv", 2, "event", "small_count"),
+        ("measure_sex_rate.csv", 3, "population", "small_count"),
+        ("time_series_population_rate.csv", 3, "mom_change", "derived_value"),
+        ("top_5_code_table.csv", 3, "Events", "small_count"),
+        ("top_5_code_table_monthly.csv", 2, "Proportion of codes (%)", "derived_value"),
+    ]
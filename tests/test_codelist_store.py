@@ -0,0 +1,44 @@
+import pandas
+from analysis import codelist_store
+
+
+def test_load_codelist(tmp_path):
+    path = tmp_path / "codelist.csv"
+    pandas.DataFrame(
+        {"code": ["30", " 4", "30", "100"], "term": ["Thirty", "Four", "Again", "Hundred"]}
+    ).to_csv(path, index=False)
+
+    codelist = codelist_store.load_codelist(path, store_directory=tmp_path / "store")
+
+    assert list(codelist.codes) == ["100", "30", "4"]
+    assert list(codelist.lookup([4, 30, 5], "term")) == ["Four", "Thirty", None]
+    assert codelist.mapping("term")["100"] == "Hundred"
+
+    # A second load reads the compiled arrays rather than the CSV
+    codelist_store._memo.clear()
+    compiled_path = codelist_store.get_compiled_path(path, store_directory=tmp_path / "store")
+    assert (compiled_path / "columns.json").exists()
+    reloaded = codelist_store.load_codelist(path, store_directory=tmp_path / "store")
+    assert list(reloaded.lookup(["100"], "term")) == ["Hundred"]
+
+    # Changing the codelist compiles a new version
+    path.write_text("code,term\n7,Seven\n")
+    assert list(codelist_store.load_codelist(path, store_directory=tmp_path / "store").codes) == ["7"]
+
+
+def test_save_is_atomic(tmp_path):
+    codelist = codelist_store.CompiledCodelist.from_frame(
+        pandas.DataFrame({"code": ["1", "2"], "term": ["One", "Two"]})
+    )
+
+    codelist.save(tmp_path / "compiled")
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["compiled"]
+
+    # A version already compiled by another process is kept, and not overwritten
+    mapped = codelist_store.CompiledCodelist.load(tmp_path / "compiled")
+    codelist_store.CompiledCodelist.from_frame(
+        pandas.DataFrame({"code": ["3"], "term": ["Three"]})
+    ).save(tmp_path / "compiled")
+    assert list(mapped.codes) == ["1", "2"]
+    assert list(codelist_store.CompiledCodelist.load(tmp_path / "compiled").codes) == ["1", "2"]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["compiled"]
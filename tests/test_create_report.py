@@ -0,0 +1,30 @@
+import base64
+import pandas
+from analysis import create_report
+
+
+def test_create_report(tmp_path, monkeypatch):
+    monkeypatch.setattr(create_report, "demographics", ["sex"])
+
+    png = b"\x89PNG\r\n\x1a\nnot really a png"
+    for name in ["plot_population", "decile_chart", "plot_sex"]:
+        (tmp_path / f"{name}.png").write_bytes(png)
+    pandas.DataFrame(
+        {"code": [1], "Description": ["<b>term</b>"], "Events": [10]}
+    ).to_csv(tmp_path / "top_5_code_table.csv", index=False)
+    pandas.DataFrame(
+        {"practice": [1], "event": [1], "population": [1], "value": [1.0], "date": ["2021-01-01"]}
+    ).to_csv(tmp_path / "measure_practice_rate.csv", index=False)
+    # The practice universe is read from the report's directory
+    pandas.DataFrame({"practice": [1, 2], "patient_id": [1, 2]}).to_csv(
+        tmp_path / "input_practice_count_2021-01-01.csv", index=False
+    )
+
+    path = tmp_path / "report.html"
+    create_report.create_report(tmp_path, path)
+
+    report = path.read_text()
+    assert report.count(base64.b64encode(png).decode("ascii")) == 3
+    assert "Breakdown by sex" in report
+    assert "&lt;b&gt;term&lt;/b&gt;" in report
+    assert "during the study period: 50.0%" in report
@@ -0,0 +1,80 @@
+import numpy as np
+from analysis import generate_dummy_data, study_expectations
+
+ANALYSIS_DIR = generate_dummy_data.ANALYSIS_DIR
+
+
+def test_load_study_definition():
+    default_expectations, index_date, variables = (
+        generate_dummy_data.load_study_definition(ANALYSIS_DIR / "study_definition.py")
+    )
+
+    assert default_expectations["incidence"] == 0.1
+    names = [v.name for v in variables]
+    assert "population" not in names
+    assert {"age_band", "sex", "practice", "event", "event_code"} <= set(names)
+
+    imd = variables[names.index("imd")]
+    assert imd.default_category == "0"
+    event_code = variables[names.index("event_code")]
+    assert event_code.returning == "code"
+    assert len(event_code.expectations["category"]["ratios"]) > 0
+
+
+def test_generate_study():
+    rng = np.random.default_rng(0)
+    df = generate_dummy_data.generate_study(
+        ANALYSIS_DIR / "study_definition.py", 1000, rng
+    )
+
+    assert len(df) == 1000
+    assert df["patient_id"].is_unique
+    assert set(df["event"].unique()) <= {0, 1}
+    assert set(df["sex"].unique()) <= {"M", "F"}
+    assert df["age_band"].notnull().all()
+
+
+def test_generate_dummy_data(tmp_path, monkeypatch):
+    monkeypatch.setattr(generate_dummy_data, "get_index_dates", lambda: ["2021-06-01"])
+
+    generate_dummy_data.generate_dummy_data(10, joined=True, output_dir=tmp_path)
+
+    assert sorted(p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob("*.gz")) == [
+        "input_2021-06-01.csv.gz",
+        "input_ethnicity.csv.gz",
+        "joined/input_2021-06-01.csv.gz",
+        "joined/input_practice_count_2021-06-01.csv.gz",
+    ]
+
+
+def test_get_input_dtypes():
+    dtypes = study_expectations.get_input_dtypes()
+
+    assert dtypes["age"] == "Int16"
+    assert dtypes["practice"] == "Int32"
+    assert dtypes["event"] == "int8"
+    assert dtypes["event_code"] == "category"
+    assert dtypes["ethnicity"] == "category"
+
+
+def test_load_study_definition_batch(monkeypatch):
+    monkeypatch.setattr(
+        study_expectations.config,
+        "batch_codelists",
+        {
+            "smr": {
+                "measure_name": "Structured medication review",
+                "codelist_path": "codelists/opensafely-structured-medication-review-nhs-england.csv",
+            }
+        },
+    )
+
+    _, _, variables = study_expectations.load_study_definition(
+        ANALYSIS_DIR / "study_definition.py"
+    )
+
+    by_name = {v.name: v for v in variables}
+    assert by_name["event_smr"].function == by_name["event"].function
+    assert list(by_name["event_code_smr"].expectations["category"]["ratios"]) == [
+        "1239511000000100"
+    ]
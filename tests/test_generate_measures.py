@@ -0,0 +1,177 @@
+import pandas
+from analysis import generate_measures, refresh_manifest
+from analysis.measure_manifest import MeasureSpec
+from pandas import testing
+
+
+SPECS = [
+    MeasureSpec("practice_rate", "event", "population", ["practice"]),
+    MeasureSpec("population_rate", "event", "population", ["population"]),
+    MeasureSpec("sex_rate", "event", "population", ["sex"]),
+]
+
+
+def write_input_files(tmp_path):
+    pandas.DataFrame(
+        {
+            "patient_id": [1, 2, 3, 4],
+            "practice": [1, 1, 2, 2],
+            "sex": ["F", "M", "F", None],
+            "event": [1, 0, 1, 1],
+        }
+    ).to_csv(tmp_path / "input_2021-01-01.csv.gz", index=False)
+    pandas.DataFrame(
+        {
+            "patient_id": [1, 2, 3],
+            "practice": [2, 1, 2],
+            "sex": ["F", "M", "F"],
+            "event": [0, 1, 0],
+        }
+    ).to_csv(tmp_path / "input_2021-02-01.csv.gz", index=False)
+
+
+def test_get_input_columns():
+    assert generate_measures.get_input_columns(SPECS) == ["practice", "event", "sex"]
+
+
+def test_calculate_measures(tmp_path):
+    write_input_files(tmp_path)
+
+    obs = generate_measures.calculate_measures(SPECS, tmp_path, chunksize=2)
+
+    exp_practice = pandas.DataFrame(
+        {
+            "practice": [1, 2, 1, 2],
+            "event": [1, 2, 1, 0],
+            "population": [2, 2, 1, 2],
+            "value": [0.5, 1.0, 1.0, 0.0],
+            "date": ["2021-01-01", "2021-01-01", "2021-02-01", "2021-02-01"],
+        }
+    )
+    testing.assert_frame_equal(obs["practice_rate"], exp_practice, check_dtype=False)
+
+    exp_population = pandas.DataFrame(
+        {
+            "event": [3, 1],
+            "population": [4, 3],
+            "value": [0.75, 1 / 3],
+            "date": ["2021-01-01", "2021-02-01"],
+        }
+    )
+    testing.assert_frame_equal(
+        obs["population_rate"], exp_population, check_dtype=False
+    )
+
+    # The patient with no sex is left out, as cohortextractor does
+    sex = obs["sex_rate"]
+    assert sex["sex"].tolist() == ["F", "M", "F", "M"]
+    assert sex["event"].tolist() == [2, 0, 0, 1]
+    assert sex["population"].tolist() == [2, 1, 2, 1]
+
+
+def read_measure_table(tmp_path, measure_id):
+    return pandas.read_csv(tmp_path / f"measure_{measure_id}.csv")
+
+
+def test_refresh_measures_merges_changed_month(tmp_path):
+    write_input_files(tmp_path)
+    generate_measures.refresh_measures(SPECS, tmp_path, chunksize=2)
+    pandas.DataFrame(
+        {
+            "patient_id": [1, 2, 3, 4],
+            "practice": [2, 1, 2, 1],
+            "sex": ["F", "M", "F", "M"],
+            "event": [1, 1, 1, 0],
+        }
+    ).to_csv(tmp_path / "input_2021-02-01.csv.gz", index=False)
+
+    generate_measures.refresh_measures(SPECS, tmp_path, chunksize=2)
+
+    obs = read_measure_table(tmp_path, "practice_rate")
+    exp = generate_measures.calculate_measures(SPECS, tmp_path)["practice_rate"]
+    testing.assert_frame_equal(obs, exp.reset_index(drop=True), check_dtype=False)
+    assert not obs.duplicated(["practice", "date"]).any()
+
+
+def test_refresh_measures_drops_removed_month(tmp_path):
+    write_input_files(tmp_path)
+    generate_measures.refresh_measures(SPECS, tmp_path, chunksize=2)
+    (tmp_path / "input_2021-02-01.csv.gz").unlink()
+
+    generate_measures.refresh_measures(SPECS, tmp_path, chunksize=2)
+
+    for spec in SPECS:
+        assert read_measure_table(tmp_path, spec.id)["date"].unique().tolist() == ["2021-01-01"]
+    manifest = refresh_manifest.load_refresh_manifest(refresh_manifest.GENERATE_MANIFEST, tmp_path)
+    assert list(manifest["inputs"]) == ["2021-01-01"]
+    assert manifest["measures"]["sex_rate"]["pending_redaction"] == ["2021-01-01"]
+
+
+def test_refresh_measures_recalculates_table_of_unknown_provenance(tmp_path):
+    write_input_files(tmp_path)
+    generate_measures.refresh_measures(SPECS, tmp_path, chunksize=2)
+    exp = read_measure_table(tmp_path, "sex_rate")
+    # Edited by hand, so the manifest no longer describes it
+    exp.head(1).to_csv(tmp_path / "measure_sex_rate.csv", index=False)
+
+    generate_measures.refresh_measures(SPECS, tmp_path, chunksize=2)
+
+    testing.assert_frame_equal(read_measure_table(tmp_path, "sex_rate"), exp)
+
+
+def test_refresh_measures_matches_full_run(tmp_path):
+    specs = SPECS + [MeasureSpec("event_code_rate", "event", "population", ["event_code"])]
+
+    def write_month(directory, date, event_codes):
+        pandas.DataFrame(
+            {
+                "patient_id": [1, 2, 3, 4],
+                "practice": [1, 1, 2, None],
+                "sex": ["F", "M", None, "F"],
+                "event": [1, 0, 1, 1],
+                "event_code": event_codes,
+            }
+        ).to_csv(directory / f"input_{date}.csv.gz", index=False)
+
+    months = {
+        "2021-01-01": ["198081000000101", None, "271649006", "198081000000101"],
+        "2021-02-01": ["271649006", None, None, "314438006"],
+    }
+    for name in ["full", "incremental"]:
+        (tmp_path / name).mkdir()
+    for date, event_codes in months.items():
+        write_month(tmp_path / "full", date, event_codes)
+    generate_measures.refresh_measures(specs, tmp_path / "full", full=True)
+
+    # The later month arrives after the first run
+    write_month(tmp_path / "incremental", "2021-01-01", months["2021-01-01"])
+    generate_measures.refresh_measures(specs, tmp_path / "incremental")
+    write_month(tmp_path / "incremental", "2021-02-01", months["2021-02-01"])
+    generate_measures.refresh_measures(specs, tmp_path / "incremental")
+
+    for spec in specs:
+        name = f"measure_{spec.id}.csv"
+        assert (tmp_path / "incremental" / name).read_bytes() == (tmp_path / "full" / name).read_bytes(), name
+
+
+def test_refresh_measures_keeps_redacted_months(tmp_path):
+    write_input_files(tmp_path)
+    generate_measures.refresh_measures(SPECS, tmp_path, chunksize=2)
+    # Redacted as redact_measures.py would, with the count and rate left blank
+    path = tmp_path / "measure_sex_rate.csv"
+    redacted = pandas.read_csv(path, dtype=str, keep_default_na=False)
+    redacted.loc[1, ["event", "value"]] = ""
+    redacted.to_csv(path, index=False)
+    redact_manifest = refresh_manifest.load_refresh_manifest(refresh_manifest.REDACT_MANIFEST, tmp_path)
+    redact_manifest["measures"]["sex_rate"] = {"hash": refresh_manifest.file_hash(path)}
+    refresh_manifest.save_refresh_manifest(redact_manifest, refresh_manifest.REDACT_MANIFEST, tmp_path)
+    january = [line for line in path.read_text().splitlines() if "2021-01-01" in line]
+
+    write_input_files(tmp_path)
+    pandas.DataFrame(
+        {"patient_id": [1], "practice": [1], "sex": ["M"], "event": [1]}
+    ).to_csv(tmp_path / "input_2021-02-01.csv.gz", index=False)
+    generate_measures.refresh_measures(SPECS, tmp_path, chunksize=2)
+
+    assert [line for line in path.read_text().splitlines() if "2021-01-01" in line] == january
+    assert read_measure_table(tmp_path, "sex_rate")["date"].tolist() == ["2021-01-01", "2021-01-01", "2021-02-01"]
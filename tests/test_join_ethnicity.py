@@ -0,0 +1,35 @@
+import pandas
+from analysis import join_ethnicity
+from pandas import testing
+
+
+def test_join_ethnicity(tmp_path):
+    month = pandas.DataFrame(
+        {
+            "patient_id": [5, 1, 3, 9, 1],
+            "age": [30, None, 50, 60, None],
+            "sex": ["F", "M", "F", "M", "M"],
+        }
+    )
+    ethnicity = pandas.DataFrame(
+        {
+            "patient_id": [1, 9, 5, 4],
+            "eth": ["1", None, "3", "2"],
+            "ethnicity": ["White", "Unknown", "Asian", "Mixed"],
+        }
+    )
+    month.to_csv(tmp_path / "input_2021-01-01.csv.gz", index=False)
+    month.head(1).to_csv(tmp_path / "input_2021-02-01.csv.gz", index=False)
+    ethnicity.to_csv(tmp_path / "input_ethnicity.csv.gz", index=False)
+
+    join_ethnicity.join_ethnicity(
+        tmp_path, tmp_path / "input_ethnicity.csv.gz", tmp_path / "joined", chunksize=2
+    )
+
+    obs = pandas.read_csv(tmp_path / "joined" / "input_2021-01-01.csv.gz")
+    exp = pandas.read_csv(tmp_path / "input_2021-01-01.csv.gz").merge(
+        pandas.read_csv(tmp_path / "input_ethnicity.csv.gz"), on="patient_id", how="left"
+    )
+    testing.assert_frame_equal(obs, exp)
+    assert (tmp_path / "joined" / "input_2021-02-01.csv.gz").exists()
+    assert not (tmp_path / "joined" / "input_ethnicity.csv.gz").exists()
@@ -0,0 +1,85 @@
+import pandas
+import pytest
+from analysis import measure_io
+from pandas import testing
+
+
+@pytest.fixture
+def measure_table():
+    """Returns a redacted measure table."""
+    return pandas.DataFrame(
+        {
+            "sex": pandas.Series(["M", "F", "M", "F"]),
+            "event": pandas.Series([6, 7, 8, 9]),
+            "population": pandas.Series([10, 10, 10, 10]),
+            "value": pandas.Series([0.6, 0.7, 0.8, 0.9]),
+            "date": pandas.to_datetime(
+                pandas.Series(
+                    ["2019-02-01", "2019-01-01", "2019-01-01", "2019-02-01"]
+                )
+            ),
+        }
+    )
+
+
+def write_measure(df, tmp_path):
+    df.to_csv(measure_io.get_measure_path("sex_rate", tmp_path), index=False)
+    return measure_io.write_measure_cache(df, "sex_rate", tmp_path, tmp_path / "cache")
+
+
+def test_read_measure_from_cache(tmp_path, measure_table):
+    pytest.importorskip("pyarrow")
+    write_measure(measure_table, tmp_path)
+
+    obs = measure_io.read_measure("sex_rate", tmp_path, tmp_path / "cache")
+
+    assert obs["sex"].dtype == "category"
+    assert obs["date"].is_monotonic_increasing
+    exp = measure_table.sort_values(by="date", kind="stable").reset_index(drop=True)
+    testing.assert_frame_equal(obs, exp, check_categorical=False, check_dtype=False)
+
+
+def test_read_measure_ignores_stale_cache(tmp_path, measure_table):
+    pytest.importorskip("pyarrow")
+    write_measure(measure_table, tmp_path)
+    measure_table.head(2).to_csv(
+        measure_io.get_measure_path("sex_rate", tmp_path), index=False
+    )
+
+    obs = measure_io.read_measure("sex_rate", tmp_path, tmp_path / "cache")
+
+    assert list(obs["sex"]) == ["F", "M"]
+
+
+def test_read_measure_ignores_cache_of_same_size_csv(tmp_path, measure_table):
+    pytest.importorskip("pyarrow")
+    write_measure(measure_table, tmp_path)
+    changed = measure_table.assign(event=[6, 7, 8, 8])
+    changed.to_csv(measure_io.get_measure_path("sex_rate", tmp_path), index=False)
+
+    obs = measure_io.read_measure("sex_rate", tmp_path, tmp_path / "cache")
+
+    assert sorted(obs["event"]) == [6, 7, 8, 8]
+
+
+def test_read_measure_without_cache(tmp_path, measure_table):
+    measure_table.to_csv(measure_io.get_measure_path("sex_rate", tmp_path), index=False)
+
+    obs = measure_io.read_measure("sex_rate", tmp_path, tmp_path / "cache")
+
+    assert list(obs["date"]) == sorted(measure_table["date"])
+
+
+def test_read_measure_csv_dtypes(tmp_path, measure_table):
+    measure_table.loc[0, "event"] = None
+    measure_table.to_csv(measure_io.get_measure_path("sex_rate", tmp_path))
+
+    obs = measure_io.read_measure_csv("sex_rate", tmp_path)
+
+    assert list(obs.columns) == list(measure_table.columns)
+    assert obs["sex"].dtype == "category"
+    assert obs["event"].dtype == "Int32"
+    assert obs["event"].isna().sum() == 1
+    assert obs["population"].dtype == "Int32"
+    assert obs["value"].dtype == "float32"
+    testing.assert_series_equal(obs["date"], measure_table["date"], check_dtype=False)
@@ -0,0 +1,76 @@
+from analysis import measure_manifest
+from analysis.config import demographics
+
+
+def test_build_measure_specs():
+    specs = measure_manifest.build_measure_specs()
+
+    assert [spec.id for spec in specs] == [
+        "event_code_rate",
+        "practice_rate",
+        "population_rate",
+    ] + [f"{d}_rate" for d in demographics]
+    assert all(len(spec.group_by) == 1 for spec in specs)
+
+
+def test_to_measure_kwargs():
+    population, sex = (
+        measure_manifest.MeasureSpec("population_rate", "event", "population", ["population"]),
+        measure_manifest.MeasureSpec("sex_rate", "event", "population", ["sex"]),
+    )
+
+    assert population.to_measure_kwargs()["group_by"] == "population"
+    assert sex.to_measure_kwargs() == {
+        "id": "sex_rate",
+        "numerator": "event",
+        "denominator": "population",
+        "group_by": ["sex"],
+        "small_number_suppression": False,
+    }
+
+
+def test_manifest_round_trip(tmp_path):
+    specs = measure_manifest.build_measure_specs()
+    path = measure_manifest.write_manifest(specs, tmp_path / "measures.json")
+
+    assert measure_manifest.load_manifest(path) == specs
+
+
+def test_get_measure_specs_reads_manifest(tmp_path, monkeypatch):
+    path = tmp_path / "measures.json"
+    monkeypatch.setattr(measure_manifest, "MANIFEST_PATH", path)
+    specs = measure_manifest.build_measure_specs()
+
+    # Built from the config until the manifest is written
+    assert measure_manifest.get_measure_specs() == specs
+
+    # The manifest is read as written, whatever the config
+    measure_manifest.write_manifest(specs[:1], path)
+    monkeypatch.setattr(measure_manifest, "demographics", ["sex"])
+    assert measure_manifest.get_measure_specs() == specs[:1]
+
+
+def test_get_measure_specs_batch(monkeypatch):
+    monkeypatch.setattr(
+        measure_manifest,
+        "batch_codelists",
+        {"smr": {"measure_name": "SMR", "codelist_path": "codelists/smr.csv"}},
+    )
+
+    specs = measure_manifest.build_measure_specs()
+
+    batch_specs = [spec for spec in specs if spec.namespace == "smr"]
+    assert len(batch_specs) * 2 == len(specs)
+    event_code = batch_specs[0]
+    assert event_code.id == "event_code_rate_smr"
+    assert event_code.numerator == "event_smr"
+    assert event_code.group_by == ["event_code_smr"]
+    assert event_code.breakdown == "event_code"
+    assert event_code.output_name("plot_event_code.png") == "plot_event_code_smr.png"
+    assert "namespace" not in event_code.to_measure_kwargs()
+
+
+def test_namespaced():
+    assert measure_manifest.namespaced("top_5_code_table.csv", "") == "top_5_code_table.csv"
+    assert measure_manifest.namespaced("top_5_code_table.csv", "smr") == "top_5_code_table_smr.csv"
+    assert measure_manifest.namespaced("event", "smr") == "event_smr"
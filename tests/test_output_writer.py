@@ -0,0 +1,57 @@
+import gzip
+import pandas
+import pytest
+from analysis import output_writer
+from pandas import testing
+
+
+def test_write_table(tmp_path):
+    df = pandas.DataFrame({"practice": [3, 1, 2], "value": [0.5, None, 1.0]}, index=[7, 8, 9])
+
+    record = output_writer.write_table(df, tmp_path / "table.csv", chunksize=2)
+
+    assert record["rows"] == 3
+    assert (tmp_path / "table.csv").read_text() == df.to_csv(index=False)
+    assert output_writer.read_record(tmp_path / "table.csv") == record
+    assert output_writer.verify_output(tmp_path / "table.csv")
+
+    # Changing the file afterwards is detected
+    (tmp_path / "table.csv").write_text("practice,value\n")
+    assert not output_writer.verify_output(tmp_path / "table.csv")
+
+
+def test_write_table_formats(tmp_path):
+    df = pandas.DataFrame({"patient_id": [1, 2, 3], "sex": ["F", "M", "F"]})
+    chunks = [df.iloc[:2], df.iloc[2:]]
+
+    output_writer.write_table(iter(chunks), tmp_path / "table.csv.gz")
+    output_writer.write_table(df, tmp_path / "table.feather", chunksize=1)
+
+    with gzip.open(tmp_path / "table.csv.gz", "rt") as f:
+        assert f.read() == df.to_csv(index=False)
+    testing.assert_frame_equal(pandas.read_feather(tmp_path / "table.feather"), df)
+    assert output_writer.verify_output(tmp_path / "table.csv.gz")
+    assert output_writer.verify_output(tmp_path / "table.feather")
+
+    # An empty table is written with its header
+    output_writer.write_table(df.head(0), tmp_path / "empty.csv")
+    assert (tmp_path / "empty.csv").read_text() == "patient_id,sex\n"
+
+
+def test_write_table_failure_keeps_existing_file(tmp_path):
+    df = pandas.DataFrame({"a": [1, 2]})
+    output_writer.write_table(df, tmp_path / "table.csv")
+
+    def failing_chunks():
+        yield df
+        raise RuntimeError("interrupted")
+
+    with pytest.raises(RuntimeError):
+        output_writer.write_table(failing_chunks(), tmp_path / "table.csv")
+
+    assert (tmp_path / "table.csv").read_text() == "a\n1\n2\n"
+    assert output_writer.verify_output(tmp_path / "table.csv")
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        output_writer.OUTPUT_RECORDS_DIR,
+        "table.csv",
+    ]
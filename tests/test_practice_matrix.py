@@ -0,0 +1,52 @@
+import numpy
+import pandas
+from analysis import practice_matrix, utilities
+from pandas import testing
+
+
+def practice_table():
+    return pandas.DataFrame(
+        {
+            "practice": [2, 1, 3, 1, 2],
+            "event": pandas.array([0, 10, 2, 8, 0], dtype="Int32"),
+            "population": pandas.array([10, 20, 30, 40, 10], dtype="Int32"),
+            "value": numpy.array([0.0, 0.5, 0.0667, 0.2, 0.0], dtype="float32"),
+            "date": pandas.to_datetime(
+                ["2021-01-01", "2021-01-01", "2021-01-01", "2021-02-01", "2021-02-01"]
+            ),
+        }
+    )
+
+
+def test_practice_matrix_round_trip():
+    df = practice_table()
+
+    matrix = practice_matrix.PracticeMatrix.from_frame(df)
+
+    assert matrix.practices.dtype == numpy.int32
+    assert list(matrix.practices) == [1, 2, 3]
+    assert list(matrix.months.strftime("%Y-%m-%d")) == ["2021-01-01", "2021-02-01"]
+    numpy.testing.assert_array_equal(matrix.event, [[10, 8], [0, 0], [2, numpy.nan]])
+    numpy.testing.assert_array_equal(matrix.present, [[True, True], [True, True], [True, False]])
+
+    exp = df.sort_values(["date", "practice"], ignore_index=True)
+    testing.assert_frame_equal(matrix.to_frame(), exp.astype({"practice": "int32"}))
+
+
+def test_utilities_accept_practice_matrix(tmp_path):
+    df = practice_table()
+    matrix = utilities.PracticeMatrix.from_frame(df)
+
+    relevant = utilities.drop_irrelevant_practices(matrix, "practice")
+    assert list(relevant.practices) == [1, 3]
+    assert utilities.get_number_practices(relevant) == 2
+    assert utilities.build_practice_activity_index(matrix).to_numpy().tolist() == [
+        [True, True],
+        [False, False],
+        [True, False],
+    ]
+
+    testing.assert_frame_equal(
+        utilities.compute_deciles(matrix, column="event"),
+        utilities.compute_deciles(df, column="event"),
+    )
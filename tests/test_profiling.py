@@ -0,0 +1,41 @@
+import json
+import pandas
+from analysis import profiling
+
+
+def test_stage_records_rows_and_times(tmp_path):
+    profiling.collect()
+
+    with profiling.stage("read", measure="sex_rate") as record:
+        record["rows"] = 10
+
+    @profiling.profiled
+    def count(df):
+        return len(df)
+
+    count(df=pandas.DataFrame({"a": [1, 2, 3]}))
+    # A path has a length, but no rows
+    count("output/joined")
+
+    records = profiling.write_profile("test", tmp_path)
+
+    assert [(r["stage"], r["measure"], r["rows"]) for r in records] == [
+        ("read", "sex_rate", 10),
+        ("count", None, 3),
+        ("count", None, None),
+    ]
+    assert all(r["wall_s"] >= 0 and r["cpu_s"] >= 0 for r in records)
+    assert json.loads((tmp_path / "test.json").read_text()) == records
+    assert len(pandas.read_csv(tmp_path / "test.csv")) == 3
+    assert profiling.collect() == []
+
+
+def test_stage_cprofile(tmp_path, monkeypatch):
+    monkeypatch.setenv(profiling.CPROFILE_ENV_VAR, "slow")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+
+    with profiling.stage("slow", measure="sex_rate"):
+        sum(range(1000))
+    profiling.collect()
+
+    assert len(list(tmp_path.glob("slow_sex_rate_*.prof"))) == 1
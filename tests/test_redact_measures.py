@@ -0,0 +1,101 @@
+import pandas
+import pytest
+from analysis import generate_measures, redact_measures
+
+
+def write_measure_tables(directory):
+    directory.mkdir()
+    pandas.DataFrame(
+        {
+            "sex": ["F", "M", "F", "M"],
+            "event": [3, 40, 50, 60],
+            "population": [100, 200, 300, 400],
+            "value": [0.03, 0.2, 0.1667, 0.15],
+            "date": ["2021-01-01", "2021-01-01", "2021-02-01", "2021-02-01"],
+        }
+    ).to_csv(directory / "measure_sex_rate.csv", index=False)
+    pandas.DataFrame(
+        {
+            "event": [4, 110],
+            "population": [300, 700],
+            "value": [0.0133, 0.1571],
+            "date": ["2021-01-01", "2021-02-01"],
+        }
+    ).to_csv(directory / "measure_population_rate.csv", index=False)
+
+
+@pytest.fixture
+def measures(monkeypatch):
+    monkeypatch.setattr(
+        redact_measures,
+        "measures_dict",
+        {key: redact_measures.measures_dict[key] for key in ["sex_rate", "population_rate"]},
+    )
+
+
+@pytest.mark.parametrize("jobs", [2, 4])
+def test_redact_measures_jobs_match_sequential(tmp_path, monkeypatch, measures, jobs):
+    for name in ["sequential", "parallel"]:
+        write_measure_tables(tmp_path / name)
+    monkeypatch.setattr(redact_measures, "OUTPUT_DIR", tmp_path / "sequential")
+    redact_measures.redact_measures(jobs=1)
+    monkeypatch.setattr(redact_measures, "OUTPUT_DIR", tmp_path / "parallel")
+    redact_measures.redact_measures(jobs=jobs)
+
+    for filename in ["measure_sex_rate.csv", "measure_population_rate.csv"]:
+        sequential = (tmp_path / "sequential" / filename).read_bytes()
+        assert (tmp_path / "parallel" / filename).read_bytes() == sequential
+    assert "F,,100,," in (tmp_path / "sequential" / "measure_sex_rate.csv").read_text()
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_redact_measures_names_failed_measure(tmp_path, monkeypatch, measures, jobs):
+    write_measure_tables(tmp_path / "joined")
+    (tmp_path / "joined" / "measure_sex_rate.csv").unlink()
+    monkeypatch.setattr(redact_measures, "OUTPUT_DIR", tmp_path / "joined")
+
+    with pytest.raises(RuntimeError, match="'sex_rate'"):
+        redact_measures.redact_measures(jobs=jobs)
+
+
+def test_redact_measures_incremental_redacts_pending_months(tmp_path, monkeypatch, measures):
+    def write_input_file(date, events):
+        pandas.DataFrame(
+            {
+                "patient_id": range(len(events)),
+                "practice": [1] * len(events),
+                "sex": ["F", "M"] * (len(events) // 2),
+                "event": events,
+            }
+        ).to_csv(tmp_path / f"input_{date}.csv.gz", index=False)
+
+    specs = list(redact_measures.measures_dict.values())
+    monkeypatch.setattr(redact_measures, "OUTPUT_DIR", tmp_path)
+    redacted_dates = []
+
+    def redact_small_numbers(df, *args):
+        redacted_dates.extend(df["date"].dt.strftime("%Y-%m-%d").unique())
+        return utilities_redact(df, *args)
+
+    utilities_redact = redact_measures.redact_small_numbers
+    monkeypatch.setattr(redact_measures, "redact_small_numbers", redact_small_numbers)
+
+    write_input_file("2021-01-01", [1, 0] * 10)
+    write_input_file("2021-02-01", [1, 1] * 10)
+    generate_measures.refresh_measures(specs, tmp_path)
+    redact_measures.redact_measures(incremental=True)
+    assert sorted(set(redacted_dates)) == ["2021-01-01", "2021-02-01"]
+    redacted = (tmp_path / "measure_sex_rate.csv").read_text()
+
+    redacted_dates.clear()
+    write_input_file("2021-03-01", [0, 1] * 10)
+    generate_measures.refresh_measures(specs, tmp_path)
+    redact_measures.redact_measures(incremental=True)
+    assert set(redacted_dates) == {"2021-03-01"}
+
+    # Nothing is left to redact
+    assert redact_measures.get_dates_to_redact() == {}
+    # The months redacted before are kept as they were
+    lines = (tmp_path / "measure_sex_rate.csv").read_text().splitlines()
+    assert lines[:5] == redacted.splitlines()
+    assert [line.split(",")[-1] for line in lines[5:]] == ["2021-03-01"] * 2
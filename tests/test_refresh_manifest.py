@@ -0,0 +1,49 @@
+from analysis import refresh_manifest
+
+
+def test_file_hash(tmp_path):
+    path = tmp_path / "measure_sex_rate.csv"
+    path.write_text("sex,event\n")
+
+    assert refresh_manifest.file_hash(path) == refresh_manifest.file_hash(path)
+    assert refresh_manifest.file_hash(tmp_path / "missing.csv") is None
+
+
+def test_get_changed_dates():
+    previous = {"2021-01-01": "a", "2021-02-01": "b", "2021-03-01": "c"}
+    current = {"2021-01-01": "a", "2021-02-01": "x", "2021-04-01": "d"}
+
+    changed, removed = refresh_manifest.get_changed_dates(previous, current)
+
+    assert changed == ["2021-02-01", "2021-04-01"]
+    assert removed == ["2021-03-01"]
+
+
+def test_get_pending_dates():
+    generate_manifest = {
+        "inputs": {},
+        "measures": {"sex_rate": {"hash": "g", "pending_redaction": ["2021-02-01"]}},
+    }
+    redact_manifest = {"measures": {"sex_rate": {"hash": "r"}}}
+
+    def pending(current_hash):
+        return refresh_manifest.get_pending_dates(
+            "sex_rate", current_hash, generate_manifest, redact_manifest
+        )
+
+    assert pending("g") == ["2021-02-01"]
+    assert pending("r") == []
+    assert pending("unknown") is None
+    assert pending(None) is None
+
+
+def test_refresh_manifest_round_trip(tmp_path):
+    assert refresh_manifest.load_refresh_manifest("manifest.json", tmp_path) == {
+        "inputs": {},
+        "measures": {},
+    }
+
+    manifest = {"inputs": {"2021-01-01": "a"}, "measures": {}}
+    refresh_manifest.save_refresh_manifest(manifest, "manifest.json", tmp_path)
+
+    assert refresh_manifest.load_refresh_manifest("manifest.json", tmp_path) == manifest
@@ -0,0 +1,89 @@
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+import pandas
+
+# The stages bind their output directories at import, and import each other by
+# their plain module names (see conftest.py), so those are the modules patched
+import generate_top_5_tables
+import measure_io
+import plot_measures
+import redact_measures
+import run_pipeline
+import utilities
+
+MEASURE_IDS = ["event_code_rate", "practice_rate", "population_rate", "sex_rate"]
+
+CODES = ["198081000000101", "251070002", "271649006", "314438006"]
+
+
+def write_measure_tables(directory):
+    """Writes small unredacted tables for the measures in MEASURE_IDS."""
+    rng = np.random.default_rng(0)
+    dates = ["2021-01-01", "2021-02-01", "2021-03-01"]
+
+    def table(group_column, groups, mean_population):
+        population = rng.poisson(mean_population, len(groups) * len(dates))
+        event = rng.binomial(population, 0.3)
+        df = pandas.DataFrame(
+            {
+                group_column: np.tile(groups, len(dates)),
+                "event": event,
+                "population": population,
+                "value": event / np.maximum(population, 1),
+                "date": np.repeat(dates, len(groups)),
+            }
+        )
+        df.to_csv(directory / f"measure_{group_column}_rate.csv", index=False)
+
+    directory.mkdir()
+    table("event_code", CODES, 20)
+    table("practice", np.arange(1, 21), 15)
+    table("sex", ["F", "M"], 200)
+    population = pandas.read_csv(directory / "measure_sex_rate.csv")
+    population.groupby("date", as_index=False)[["event", "population"]].sum().assign(
+        value=lambda df: df["event"] / df["population"]
+    )[["event", "population", "value", "date"]].to_csv(
+        directory / "measure_population_rate.csv", index=False
+    )
+
+
+def use_directory(monkeypatch, directory):
+    for module in [redact_measures, generate_top_5_tables, plot_measures, utilities, measure_io]:
+        monkeypatch.setattr(module, "OUTPUT_DIR", directory)
+    monkeypatch.setattr(measure_io, "CACHE_DIR", directory / "cache")
+
+
+def test_run_pipeline_matches_separate_actions(tmp_path, monkeypatch):
+    for key in list(redact_measures.measures_dict):
+        if key not in MEASURE_IDS:
+            monkeypatch.delitem(redact_measures.measures_dict, key)
+
+    write_measure_tables(tmp_path / "separate")
+    use_directory(monkeypatch, tmp_path / "separate")
+    redact_measures.redact_measures()
+    generate_top_5_tables.generate_top_5_tables()
+    plot_measures.plot_all_measures()
+
+    write_measure_tables(tmp_path / "pipeline")
+    use_directory(monkeypatch, tmp_path / "pipeline")
+    run_pipeline.run_pipeline()
+
+    def get_files(directory):
+        return sorted(
+            path.relative_to(directory) for path in directory.rglob("*") if path.is_file()
+        )
+
+    separate = get_files(tmp_path / "separate")
+    assert separate == get_files(tmp_path / "pipeline")
+    assert len(separate) > len(MEASURE_IDS)
+    for path in separate:
+        assert (tmp_path / "separate" / path).read_bytes() == (
+            tmp_path / "pipeline" / path
+        ).read_bytes(), path
+
+    # The released decile table is rounded
+    deciles = pandas.read_csv(tmp_path / "separate" / "decile_table.csv")
+    assert (deciles["event"] == deciles["event"].round(2)).all()
@@ -0,0 +1,81 @@
+import numpy
+import pandas
+from analysis import time_series
+from analysis.measure_manifest import MeasureSpec
+from pandas import testing
+
+
+def test_pivot_measure():
+    df = pandas.DataFrame(
+        {
+            "sex": ["M", "F", "F", "M"],
+            "value": [0.1, 0.2, None, 0.4],
+            "date": pandas.to_datetime(["2021-01-01", "2021-01-01", "2021-02-01", "2021-04-01"]),
+        }
+    )
+
+    array = time_series.pivot_measure(df, ["sex"])
+
+    assert list(array.groups["sex"]) == ["F", "M"]
+    assert list(array.months.strftime("%Y-%m-%d")) == ["2021-01-01", "2021-02-01", "2021-03-01", "2021-04-01"]
+    numpy.testing.assert_array_equal(
+        array.values,
+        [[0.2, numpy.nan, numpy.nan, numpy.nan], [0.1, numpy.nan, numpy.nan, 0.4]],
+    )
+
+
+def test_rolling_mean_and_change():
+    values = numpy.array([[1.0, 2.0, numpy.nan, 4.0, 0.0, 5.0]])
+
+    numpy.testing.assert_array_equal(
+        time_series.rolling_mean(values, 3),
+        [[numpy.nan, numpy.nan, 1.5, 3.0, 2.0, 3.0]],
+    )
+    numpy.testing.assert_array_equal(
+        time_series.change(values, 1),
+        [[numpy.nan, 1.0, numpy.nan, numpy.nan, -4.0, 5.0]],
+    )
+    numpy.testing.assert_array_equal(
+        time_series.change(values, 1, relative=True),
+        [[numpy.nan, 100.0, numpy.nan, numpy.nan, -100.0, numpy.nan]],
+    )
+    assert numpy.isnan(time_series.change(values, 12)).all()
+
+
+def test_write_time_series(tmp_path):
+    measure = MeasureSpec("population_rate", "event", "population", ["population"])
+    df = pandas.DataFrame(
+        {
+            "event": [1, 2, 3, 4],
+            "population": [10, 10, 10, 10],
+            "value": [0.1, 0.2, 0.3, 0.4],
+            "date": pandas.date_range("2021-01-01", periods=4, freq="MS"),
+        }
+    )
+
+    time_series.write_time_series(measure, df, tmp_path)
+
+    obs = pandas.read_csv(tmp_path / "time_series_population_rate.csv")
+    assert list(obs.columns) == [
+        "date",
+        "value",
+        "rolling_mean",
+        "mom_change",
+        "mom_percent_change",
+        "yoy_change",
+        "yoy_percent_change",
+    ]
+    numpy.testing.assert_allclose(obs["rolling_mean"], [numpy.nan, numpy.nan, 0.2, 0.3], rtol=1e-6)
+    numpy.testing.assert_allclose(obs["mom_percent_change"], [numpy.nan, 100, 50, 100 / 3], rtol=1e-6)
+
+    comparison = time_series.compare_periods(
+        time_series.pivot_measure(df, []), ("2021-01-01", "2021-02-01"), ("2021-04-01", "2021-04-01")
+    )
+    testing.assert_frame_equal(
+        comparison,
+        pandas.DataFrame(
+            {"baseline": [0.15], "current": [0.4], "change": [0.25], "percent_change": [500 / 3]},
+            dtype="float32",
+        ),
+    )
+    assert (tmp_path / "baseline_comparison_population_rate.csv").exists()
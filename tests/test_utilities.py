@@ -1,3 +1,4 @@
+import argparse
 import pandas
 import pytest
 from analysis import utilities
@@ -125,6 +126,46 @@ def test_redact_small_numbers(measure_table):
     
     testing.assert_frame_equal(obs, exp)
 
+def test_redact_small_numbers_by_date(measure_table):
+    obs = utilities.redact_small_numbers(
+        measure_table, 5, "event", "population", "value", "date"
+    )
+
+    exp = measure_table.copy()
+    # 2019-01-01 only has a small count of 0, so nothing is redacted.  In
+    # 2019-02-01 the 3 is redacted, followed by the next smallest count.
+    exp["event"] = pandas.Series([0, 6, np.nan, np.nan])
+    exp["value"] = pandas.Series([0.0, 0.6, np.nan, np.nan])
+
+    testing.assert_frame_equal(obs, exp)
+
+
+def test_redact_small_numbers_groups_rows_by_date():
+    df = pandas.DataFrame(
+        {
+            "event": pandas.Series([2, 8, 9, 7, 6]),
+            "population": pandas.Series([10, 10, 10, 10, 10]),
+            "value": pandas.Series([0.2, 0.8, 0.9, 0.7, 0.6]),
+            "date": pandas.to_datetime(
+                pandas.Series(
+                    [
+                        "2019-01-01",
+                        "2019-02-01",
+                        "2019-01-01",
+                        "2019-02-01",
+                        "2019-01-01",
+                    ]
+                )
+            ),
+        }
+    )
+    obs = utilities.redact_small_numbers(df, 5, "event", "population", "value", "date")
+
+    assert list(obs.index) == [0, 2, 4, 1, 3]
+    assert obs["event"].isna().tolist() == [True, False, True, False, False]
+    assert obs["value"].isna().tolist() == [True, False, True, False, False]
+
+
 class TestDropIrrelevantPractices:
     def test_irrelevant_practices_dropped(self, measure_table):
         obs = utilities.drop_irrelevant_practices(measure_table, 'practice')
@@ -178,4 +219,215 @@ def test_get_percentage_practices(tmp_path, practice_count_table, measure_table)
 
             obs = utilities.get_percentage_practices(measure_table)
             
-            assert obs == 80
\ No newline at end of file
+            assert obs == 80
+
+def test_read_input_files(tmp_path):
+    for date, events in [("2021-02-01", [1, 0, 1]), ("2021-01-01", [0, 0, 1])]:
+        pandas.DataFrame(
+            {
+                "patient_id": [1, 2, 3],
+                "sex": ["F", "M", "F"],
+                "event": events,
+            }
+        ).to_csv(tmp_path / f"input_{date}.csv.gz", index=False)
+    pandas.DataFrame({"practice": [1]}).to_csv(
+        tmp_path / "input_practice_count_2021-01-01.csv.gz", index=False
+    )
+
+    obs = list(
+        utilities.read_input_files(
+            columns=["sex", "event"], directory=tmp_path, chunksize=2
+        )
+    )
+
+    assert [(date, len(chunk)) for date, chunk in obs] == [
+        (pandas.Timestamp("2021-01-01"), 2),
+        (pandas.Timestamp("2021-01-01"), 1),
+        (pandas.Timestamp("2021-02-01"), 2),
+        (pandas.Timestamp("2021-02-01"), 1),
+    ]
+    chunk = obs[0][1]
+    assert list(chunk.columns) == ["sex", "event"]
+    assert chunk["sex"].dtype == "category"
+    assert chunk["event"].dtype == "int8"
+
+
+def test_get_practice_universe_invalidated_by_new_file(tmp_path, practice_count_table):
+    practice_count_table.to_csv(
+        tmp_path / "input_practice_count_2021-01-01.csv.gz", index=False
+    )
+    obs = utilities.get_practice_universe(tmp_path)
+    assert list(obs) == [1, 2, 3, 4, 5]
+    assert (tmp_path / utilities.PRACTICE_UNIVERSE_CACHE).exists()
+
+    pandas.DataFrame({"practice": [5, 6], "patient_id": [6, 7]}).to_csv(
+        tmp_path / "input_practice_count_2021-02-01.csv.gz", index=False
+    )
+    obs = utilities.get_practice_universe(tmp_path)
+    assert list(obs) == [1, 2, 3, 4, 5, 6]
+
+
+def test_plot_measures(tmp_path, measure_table):
+    with patch.object(utilities, "OUTPUT_DIR", tmp_path):
+        utilities.plot_measures(
+            measure_table, "plot_group.png", "Breakdown by group", "value", "group"
+        )
+
+    assert (tmp_path / "plot_group.png").exists()
+
+
+def test_create_top_5_code_table(measure_table, codelist_table_from_csv):
+    obs = utilities.create_top_5_code_table(
+        measure_table, codelist_table_from_csv, "code", "term", nrows=1
+    )
+
+    # Code 2's 3 events fall outside the top row, so counts are not shown.
+    exp = pandas.DataFrame({"code": [1], "Description": ["Code 1"]})
+    testing.assert_frame_equal(obs, exp)
+
+
+def test_create_top_k_code_tables(measure_table, codelist_table_from_csv, monkeypatch):
+    compiled = []
+    from_frame = utilities.CompiledCodelist.from_frame
+
+    def spy(df, code_column="code"):
+        compiled.append(code_column)
+        return from_frame(df, code_column)
+
+    monkeypatch.setattr(utilities.CompiledCodelist, "from_frame", spy)
+
+    obs, obs_monthly = utilities.create_top_k_code_tables(
+        measure_table, codelist_table_from_csv, "code", "term", k=2
+    )
+
+    # The codelist is compiled once, for the overall and both monthly tables
+    assert compiled == ["code"]
+
+    exp = pandas.DataFrame(
+        {
+            "code": [1, 2],
+            "Description": ["Code 1", "Code 2"],
+            "Events": [13, 3],
+            "Proportion of codes (%)": [81.25, 18.75],
+        }
+    )
+    testing.assert_frame_equal(obs, exp)
+
+    exp_monthly = pandas.DataFrame(
+        {
+            "date": pandas.to_datetime(
+                pandas.Series(["2019-01-01", "2019-02-01", "2019-02-01"])
+            ),
+            "code": [1, 1, 2],
+            "Description": ["Code 1", "Code 1", "Code 2"],
+            "Events": [6, 7, 3],
+            "Proportion of codes (%)": [100.0, 70.0, 30.0],
+        }
+    )
+    testing.assert_frame_equal(obs_monthly, exp_monthly)
+
+    # With no events, the monthly table has the same columns
+    _, obs_empty = utilities.create_top_k_code_tables(
+        measure_table.iloc[0:0], codelist_table_from_csv, "code", "term", k=2
+    )
+    assert obs_empty.empty
+    assert list(obs_empty.columns) == list(exp_monthly.columns)
+    assert obs_empty["date"].dtype == exp_monthly["date"].dtype
+
+
+def test_build_practice_activity_index(measure_table):
+    obs = utilities.build_practice_activity_index(measure_table)
+
+    assert list(obs.index) == [1, 2, 3, 4]
+    assert obs.to_numpy().tolist() == [
+        [False, False],
+        [True, False],
+        [False, True],
+        [False, True],
+    ]
+
+    dropped = utilities.drop_irrelevant_practices(measure_table, "practice", obs)
+    assert all(dropped.practice.values == [2, 3, 4])
+    assert utilities.get_number_practices(measure_table, obs) == 4
+
+
+def test_activity_index_matches_table_scan():
+    df = pandas.DataFrame(
+        {
+            "practice": [1, 2, 3, 1, 2, 3, 4],
+            "event": [0, 2, 5, 1, 0, 3, 0],
+            "population": [10, 10, 10, 10, 10, 10, 10],
+            "value": [0.0, 0.2, 0.5, 0.1, 0.0, 0.3, 0.0],
+            "date": pandas.to_datetime(["2021-01-01"] * 3 + ["2021-02-01"] * 4),
+        }
+    )
+    activity_index = utilities.build_practice_activity_index(df)
+
+    testing.assert_frame_equal(
+        utilities.drop_irrelevant_practices(df, "practice", activity_index),
+        utilities.drop_irrelevant_practices(df, "practice"),
+    )
+    assert utilities.get_number_practices(df, activity_index) == utilities.get_number_practices(df)
+    testing.assert_frame_equal(
+        utilities.compute_deciles(df, column="event", activity_index=activity_index),
+        utilities.compute_deciles(utilities.drop_irrelevant_practices(df, "practice"), column="event"),
+    )
+
+    matrix = utilities.PracticeMatrix.from_frame(df)
+    matrix_index = utilities.build_practice_activity_index(matrix)
+    testing.assert_frame_equal(matrix_index, activity_index, check_index_type=False)
+    testing.assert_frame_equal(
+        utilities.compute_deciles(matrix, column="event", activity_index=matrix_index),
+        utilities.compute_deciles(df, column="event", activity_index=activity_index),
+    )
+
+
+def test_compute_deciles():
+    df = pandas.DataFrame(
+        {
+            "date": pandas.to_datetime(["2021-02-01"] * 4 + ["2021-01-01"] * 3),
+            "value": [4.0, 1.0, np.nan, 2.0, 10.0, 0.0, 20.0],
+        }
+    )
+
+    obs = utilities.compute_deciles(df, percentiles=[10, 50])
+
+    exp = pandas.DataFrame(
+        {
+            "date": pandas.to_datetime(["2021-01-01"] * 2 + ["2021-02-01"] * 2),
+            "percentile": [10, 50, 10, 50],
+            "value": [2.0, 10.0, 1.2, 2.0],
+        }
+    )
+    testing.assert_frame_equal(obs, exp, check_dtype=False)
+
+
+def test_plot_deciles(tmp_path, measure_table):
+    deciles = utilities.compute_deciles(measure_table)
+    with patch.object(utilities, "OUTPUT_DIR", tmp_path):
+        utilities.plot_deciles(deciles, "decile_chart.png", "Decile Chart")
+
+    assert (tmp_path / "decile_chart.png").exists()
+
+
+def square(x):
+    if x < 0:
+        raise ValueError(x)
+    return x * x
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_run_jobs(jobs):
+    assert utilities.run_jobs(square, {"a": (2,), "b": (3,)}, jobs) == {"a": 4, "b": 9}
+
+    with pytest.raises(RuntimeError, match="Failed to square 'b'"):
+        utilities.run_jobs(square, {"a": (2,), "b": (-1,)}, jobs, "square")
+
+
+def test_add_jobs_argument():
+    parser = argparse.ArgumentParser()
+    utilities.add_jobs_argument(parser, "number of worker processes")
+
+    assert parser.parse_args(["--jobs", "3"]).jobs == 3
+    with pytest.raises(SystemExit):
+        parser.parse_args(["--jobs", "0"])